@@ -1,6 +1,6 @@
 from argparse import ArgumentParser
 from operator import attrgetter
-from typing import Optional, List
+from typing import Optional, List, Iterator
 from pathlib import Path
 from datetime import datetime, timedelta
 import sys
@@ -12,6 +12,32 @@ import matplotlib
 from flights import Reader, Network, Flight
 from flights.bees import BeeColonyAlgorithm, BeeColonyConfiguration
 from flights.ants import AntColonyConfiguration, AntColonyAlgorithm
+from flights.progress import Progress
+from flights.cache import LRUCache, query_key
+
+
+RESULTS_CACHE_ENTRIES = 256
+RESULTS_CACHE_TTL = 15 * 60  # seconds
+
+
+def cached_results() -> LRUCache:
+    # routes found in this session, kept across the reruns of the script
+    return st.session_state.setdefault('results', LRUCache(RESULTS_CACHE_ENTRIES, ttl=RESULTS_CACHE_TTL))
+
+
+def follow_progress(reports: Iterator[Progress]) -> Optional[List[Flight]]:
+    # shows the best route found so far while the algorithm is still running
+    bar = st.progress(0.0)
+    status = st.empty()
+
+    for progress in reports:
+        bar.progress(min(progress.iteration / progress.iterations, 1.0))
+        if progress.path is not None:
+            status.write(f'Best cost so far: {progress.cost:.2f} ({progress.elapsed:.1f}s)')
+
+    bar.empty()
+    status.empty()
+    return progress.path
 
 
 def ant_colony_algorithm(net: Network) -> Optional[List[Flight]]:
@@ -25,6 +51,11 @@ def ant_colony_algorithm(net: Network) -> Optional[List[Flight]]:
     pheromone_impact         = st.sidebar.slider('Pheromone impact', min_value=0.0, max_value=1.0, value=0.4, step=0.01)
     time_impact_nodes        = st.sidebar.slider('Cost impact - Time impact (in nodes)', min_value=0.0, max_value=1.0, value=0.6, step=0.01)
     pheromone_updating_time  = st.sidebar.number_input('Pheromone updating time', min_value=1, max_value=1000000, value=1000, step=10)
+    batched                  = st.sidebar.checkbox('Batched ants stepping', value=False)
+    warm_start               = st.sidebar.checkbox('Start from previous pheromones', value=True)
+    time_budget              = st.sidebar.number_input('Time limit (seconds, 0 - none)', min_value=0.0, value=0.0, step=1.0)
+    colonies                 = st.sidebar.number_input('Colonies (processes)', min_value=1, max_value=64, value=1, step=1)
+    exchange_every           = st.sidebar.number_input('Trails exchange every (events, 0 - never)', min_value=0, max_value=1000000000, value=0, step=100)
 
     st.markdown('### Options')
     c1, c2 = st.columns(2)
@@ -69,33 +100,45 @@ def ant_colony_algorithm(net: Network) -> Optional[List[Flight]]:
         st.warning('Origin and destination airports must be different')
         verified = False
 
+    configuration = AntColonyConfiguration(
+        iters_numb = iters_numb,
+        result_samples = result_samples,
+        ants_number = ants_number,
+        ants_spawn_iters = ants_spawn_iters,
+        connection_samples = connection_samples,
+        direct_connection_impact = direct_connection_impact,
+        time_impact_nodes = time_impact_nodes,
+        pheromone_impact = pheromone_impact,
+        pheromone_updating_time = pheromone_updating_time,
+        min_time = datetime(min_time.year, min_time.month, min_time.day),
+        max_time = datetime(max_time.year, max_time.month, max_time.day),
+        min_conn_time = min_conn_time,
+        max_conn_numb = max_conn_numb,
+        max_price = max_price,
+        time_impact_choice = time_impact_choice,
+        batched = batched,
+        warm_start = warm_start
+    )
+
+    # same query on the same network gives back the stored route, without running the algorithm again
+    key = query_key(net, configuration, origin, destination, colonies, exchange_every, time_budget)
+    results = cached_results()
+
     if st.button('Find'):
         if not verified:
             st.error('You cannot run the algorithm while there are warnings about the parameters')
             return None
 
-        configuration = AntColonyConfiguration(
-            iters_numb = iters_numb,
-            result_samples = result_samples,
-            ants_number = ants_number,
-            ants_spawn_iters = ants_spawn_iters,
-            connection_samples = connection_samples,
-            direct_connection_impact = direct_connection_impact,
-            time_impact_nodes = time_impact_nodes,
-            pheromone_impact = pheromone_impact,
-            pheromone_updating_time = pheromone_updating_time,
-            min_time = datetime(min_time.year, min_time.month, min_time.day),
-            max_time = datetime(max_time.year, max_time.month, max_time.day),
-            min_conn_time = min_conn_time,
-            max_conn_numb = max_conn_numb,
-            max_price = max_price,
-            time_impact_choice = time_impact_choice
-        )
-
-        algorithm = AntColonyAlgorithm(net, configuration)
-        return algorithm.run(origin, destination)
+        if key not in results:
+            algorithm = AntColonyAlgorithm(net, configuration)
+            if colonies > 1:
+                results.put(key, algorithm.run_colonies(
+                    origin, destination, colonies, exchange_every or None, time_budget=time_budget or None
+                ))
+            else:
+                results.put(key, follow_progress(algorithm.iterate(origin, destination, time_budget=time_budget or None)))
 
-    return None
+    return results.get(key)
 
 
 def bee_colony_algorithm(net: Network) -> Optional[List[Flight]]:
@@ -107,6 +150,8 @@ def bee_colony_algorithm(net: Network) -> Optional[List[Flight]]:
     elite_sites_bees = st.sidebar.number_input('Bees recruited for elite sites', min_value=1, max_value=20, value=4, step=1)
     rest_sites_bees  = st.sidebar.number_input('Beest recruited for the rest of the sites', min_value=1, max_value=20, value=2, step=1)
     max_shrinkages   = st.sidebar.number_input('Max shrinkages', min_value=1, max_value=10, value=3, step=1)
+    workers          = st.sidebar.number_input('Workers (processes)', min_value=1, max_value=64, value=1, step=1)
+    time_budget      = st.sidebar.number_input('Time limit (seconds, 0 - none)', min_value=0.0, value=0.0, step=1.0)
 
     st.markdown('### Options')
     c1, c2 = st.columns(2)
@@ -149,30 +194,95 @@ def bee_colony_algorithm(net: Network) -> Optional[List[Flight]]:
         st.warning('Origin and destination airports must be different')
         verified = False
 
+    configuration = BeeColonyConfiguration(
+        from_datetime = datetime(from_date.year, from_date.month, from_date.day),
+        to_datetime = datetime(to_date.year, to_date.month, to_date.day),
+        max_cost = max_cost,
+        transfer_time = timedelta(minutes=transfer_time),
+        max_transfers = max_transfers,
+        time_priority = time_priority,
+        iterations = iterations,
+        scout_bees = scout_bees,
+        best_sites = best_sites,
+        elite_sites = elite_sites,
+        elite_sites_bees = elite_sites_bees,
+        rest_sites_bees = rest_sites_bees,
+        max_shrinkages = max_shrinkages,
+        workers = workers
+    )
+
+    key = query_key(net, configuration, origin, destination, time_budget)
+    results = cached_results()
+
     if st.button('Find'):
 
         if not verified:
             st.error('You cannot run the algorithm while there are warnings about the parameters')
             return None
-        
-        configuration = BeeColonyConfiguration(
-            from_datetime = datetime(from_date.year, from_date.month, from_date.day),
-            to_datetime = datetime(to_date.year, to_date.month, to_date.day),
-            max_cost = max_cost,
-            transfer_time = timedelta(minutes=transfer_time),
-            max_transfers = max_transfers,
-            time_priority = time_priority,
-            iterations = iterations,
-            scout_bees = scout_bees,
-            best_sites = best_sites,
-            elite_sites = elite_sites,
-            elite_sites_bees = elite_sites_bees,
-            rest_sites_bees = rest_sites_bees,
-            max_shrinkages = max_shrinkages
+
+        if key not in results:
+            algorithm = BeeColonyAlgorithm(net, configuration)
+            results.put(key, follow_progress(algorithm.iterate(origin, destination, time_budget=time_budget or None)))
+
+    return results.get(key)
+
+
+def pareto_search(net: Network) -> Optional[List[Flight]]:
+    st.markdown('### Options')
+    c1, c2 = st.columns(2)
+
+    with c1:
+        max_cost      = st.number_input('Max cost', min_value=1, value=10000, step=10)
+        time_priority = st.slider('Cost priority - Time priority', min_value=0.0, max_value=1.0, value=0.5, step=0.01)
+        from_date     = st.date_input('Journey start date', min_value=net.start_date, max_value=net.end_date, value=net.start_date)
+
+    with c2:
+        max_transfers = st.number_input('Max transfers', min_value=0, value=5, step=1)
+        to_date       = st.date_input('Journey end date', min_value=net.start_date, max_value=net.end_date, value=net.end_date)
+
+    st.markdown('### Airports')
+    airports = sorted(net.airports, key=attrgetter('city'))
+    options = list(range(len(airports)))
+    c1, c2 = st.columns(2)
+
+    with c1:
+        origin_idx = st.selectbox('Origin', options=options, format_func=lambda i: f'{airports[i].city}, {airports[i].state} ({airports[i].name})')
+        origin = airports[origin_idx]
+
+    with c2:
+        destination_idx = st.selectbox('Destination', options=options, format_func=lambda i: f'{airports[i].city}, {airports[i].state} ({airports[i].name})')
+        destination = airports[destination_idx]
+
+    # parameters verification block
+    verified = True
+    if from_date >= to_date:
+        st.warning('End date must be later than the start date')
+        verified = False
+    if origin == destination:
+        st.warning('Origin and destination airports must be different')
+        verified = False
+
+    # the whole front is computed once per query, moving the priority slider only picks a point on it
+    query = (origin.codename, destination.codename, from_date, to_date, max_transfers, max_cost)
+    fronts = st.session_state.setdefault('pareto_fronts', {})
+
+    if st.button('Find'):
+        if not verified:
+            st.error('You cannot run the algorithm while there are warnings about the parameters')
+            return None
+
+        fronts[query] = net.pareto_front(
+            origin,
+            destination,
+            datetime(from_date.year, from_date.month, from_date.day),
+            datetime(to_date.year, to_date.month, to_date.day),
+            max_transfers,
+            max_cost
         )
 
-        algorithm = BeeColonyAlgorithm(net, configuration)
-        return algorithm.run(origin, destination)
+    if query in fronts:
+        st.write(f'Pareto optimal routes found: {len(fronts[query])}')
+        return fronts[query].best(time_priority)
 
     return None
 
@@ -185,7 +295,8 @@ def main(net: Network):
         'Select algorithm',
         options=[
             'Ant Colony Algorithm',
-            'Bee Colony Algorithm'
+            'Bee Colony Algorithm',
+            'Exact Pareto Search'
         ]
     )
 
@@ -193,6 +304,8 @@ def main(net: Network):
         path = ant_colony_algorithm(net)
     elif algorithm_name == 'Bee Colony Algorithm':
         path = bee_colony_algorithm(net)
+    elif algorithm_name == 'Exact Pareto Search':
+        path = pareto_search(net)
     else:
         st.error('Unkown algorithm')
 
@@ -255,11 +368,14 @@ def main(net: Network):
 
 if __name__ == '__main__':
     parser = ArgumentParser()
-    parser.add_argument('pickled_network', help='path to the pickled Network object')
+    parser.add_argument('network', help='path to the pickled Network object or to the binary network directory')
     args = parser.parse_args(sys.argv[1:])
 
     if 'net' not in st.session_state:
-        net = Reader.read_network_pickled(args.pickled_network)
+        if Path(args.network).is_dir():
+            net = Reader.read_network_binary(args.network)
+        else:
+            net = Reader.read_network_pickled(args.network)
         st.session_state.net = net
 
     main(st.session_state.net)
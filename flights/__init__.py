@@ -1,2 +1,2 @@
-from .data import Network, Airline, Airport, Flight
+from .data import Network, Airline, Airport, Flight, FlightTable
 from .reader import Reader
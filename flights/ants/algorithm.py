@@ -1,165 +1,313 @@
 import random
-import queue
+from typing import Optional, Iterator, Iterable, List, Tuple
+
 import numpy as np
-import datetime
 
-from tqdm import trange
+from tqdm import tqdm
 
 from .configuration import AntColonyConfiguration
-from ..data import Network, Flight, Airport
+from .events import EventScheduler
+from .pheromones import Pheromones
+from ..batch import group_queries, run_groups
+from ..cache import LRUCache
+from ..data import Network, Flight, Airport, to_minutes
+from ..progress import Progress, StopCondition
 
 
 class Ant:
     def __init__(self, curr_time, curr_airport):
-        self.curr_time = curr_time
-        self.curr_airport = curr_airport
+        self.curr_time = curr_time  # minutes since the epoch
+        self.curr_airport = curr_airport  # airport id
         self.mode = 'NORMAL'
 
         self.curr_trav_cost = 0
         self.curr_conn_numb = 0
-        self.path = []
-
-    def __lt__(self, other):
-        if self.mode != other.mode:
-            return self.mode < other.mode
-        return self.curr_time < other.curr_time
-
-    def __gt__(self, other):
-        if self.mode != other.mode:
-            return self.mode > other.mode
-        return self.curr_time > other.curr_time
-
-    def __eq__(self, other):
-        return self.mode == other.mode and self.curr_time == other.curr_time
+        self.path = []  # flight ids
 
-    def __ne__(self, other):
-        return not self.__eq__(other)
+    def update(self, table, flight_id):
+        if self.mode == 'NORMAL':
+            self.curr_time = int(table.arrival[flight_id])
+            self.curr_airport = int(table.destination[flight_id])
+        else:  # self.mode == 'RETURN'
+            self.curr_time = int(table.departure[flight_id])
+            self.curr_airport = int(table.origin[flight_id])
 
-    def update(self, flight):
-        self.curr_time = flight[2]['arrival_time']
-        self.curr_airport = flight[0]
-        self.curr_trav_cost += flight[2]['price']
+        self.curr_trav_cost += float(table.price[flight_id])
         self.curr_conn_numb += 1
-        self.path.append(flight[2]['flight'])
+        self.path.append(int(flight_id))
 
 
 class AntColonyAlgorithm:
-    def __init__(self, network: Network, configuration: AntColonyConfiguration):
+    # flights checked at once while looking for the first accessible ones on a route
+    SCAN_BLOCK = 16
+
+    # pheromones left by the warm started runs, shared by all the instances
+    pheromone_cache = LRUCache(32)
+
+    def __init__(self, network: Network, configuration: AntColonyConfiguration, seed: Optional[int] = None):
         self.net = network
+        self.table = network.table
         self.config = configuration
 
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+        self.best_trail = None  # (cost, flight ids) of the best path found to the destination
+
         self.global_time = 0
-        self.events = queue.PriorityQueue()
+        self.events = EventScheduler()
+        self.pheromones = Pheromones(len(network.table), configuration.pheromone_updating_time)
+
+        self.min_time = max(to_minutes(configuration.min_time), network.start_minute)
+        self.max_time = min(to_minutes(configuration.max_time), network.end_minute)
 
-    def clean_pheromones(self, mg):
-        for airport_1 in mg.nodes:
-            for airport_2 in mg.adj[airport_1]:
-                for flight in mg.adj[airport_1][airport_2]:
-                    mg.adj[airport_1][airport_2][flight]['pheromone_level'] = 0
-                    mg.adj[airport_1][airport_2][flight]['pheromone_update_time'] = 0
+    def reconfigure(self, configuration: AntColonyConfiguration):
+        # the pheromone arrays are kept for the next runs, unless their halving time changes
+        if configuration.pheromone_updating_time != self.config.pheromone_updating_time:
+            self.pheromones = Pheromones(len(self.table), configuration.pheromone_updating_time)
+
+        self.config = configuration
+        self.min_time = max(to_minutes(configuration.min_time), self.net.start_minute)
+        self.max_time = min(to_minutes(configuration.max_time), self.net.end_minute)
+
+    def clean_pheromones(self):
+        self.pheromones.reset()
+        self.best_trail = None
+
+    def reinforce_trails(self, trails):
+        # trails found by other colonies are laid down as if an ant had just walked them
+        for _, trail in trails:
+            trail = np.asarray(trail, dtype=np.int64)
+            self.pheromones.evaluate(trail, self.global_time)
+            self.pheromones.deposit_many(trail)
 
     ###
     def _init_ants(self, origin):
         time_available_min = (self.config.max_time - self.config.min_time).total_seconds() // 60
+        min_time = to_minutes(self.config.min_time)
 
         ants_spawn_gap = time_available_min // self.config.ants_spawn_iters
-        for i in range(self.config.ants_spawn_iters):
-            for j in range(self.config.ants_number // self.config.ants_spawn_iters):
-                self.events.put((i * ants_spawn_gap,
-                                 Ant(self.config.min_time + datetime.timedelta(minutes=i * ants_spawn_gap), origin)))
+        self.events.push_many(
+            (i * ants_spawn_gap, Ant(min_time + int(i * ants_spawn_gap), origin))
+            for i in range(self.config.ants_spawn_iters)
+            for j in range(self.config.ants_number // self.config.ants_spawn_iters)
+        )
 
     ###
     def _run_next_event(self, origin, destination, get_results=False, results=None):
-        self.global_time, curr_ant = self.events.get()
+        self.global_time, curr_ant = self.events.pop()
         available_flights = self._find_available_flights(curr_ant)
-        self._update_pheromones(available_flights)
-        next_flight = self._choose_flight(available_flights, curr_ant, origin, destination)
+        pheromones = self._update_pheromones(available_flights)
+        next_flight = self._choose_flight(available_flights, pheromones, curr_ant, origin, destination)
         self._make_next_flight(next_flight, curr_ant, get_results, results, origin, destination)
 
-    ###
-    def _find_available_flights(self, curr_ant):
-        all_flights = self.net.ant_graph[curr_ant.curr_airport]
-        available_flights = []
+    def _run_next_batch(self, origin, destination, get_results=False, results=None):
+        # all the events within the batch window are processed together, pheromones are evaluated
+        # at the time of the first one and the flights of all the ants are chosen at once
+        batch_start = self.global_time = self.events.peek_time()
+        events = []
+        while len(self.events) > 0 and self.events.peek_time() < batch_start + self.config.batch_window:
+            events.append(self.events.pop())
 
-        for airport in all_flights:
-            flights_added = 0
-            if curr_ant.mode == 'NORMAL':
-                start, end, order = 0, len(self.net.ant_graph.adj[curr_ant.curr_airport][airport]), 1
-            else:  # curr_ant.mode == 'RETURN'
-                start, end, order = len(self.net.ant_graph.adj[curr_ant.curr_airport][airport]) - 1, -1, -1
+        ants = [curr_ant for _, curr_ant in events]
+        flights, owners = self._find_available_flights_batch(ants)
+        next_flights = self._choose_flights(flights, owners, ants, origin, destination)
 
-            for flight_idx in range(start, end, order):
-                flight = self.net.ant_graph.adj[curr_ant.curr_airport][airport][flight_idx]
-                if self._is_accessible_flight(curr_ant, flight):
-                    available_flights.append((airport, flight_idx, flight))
-                    flights_added += 1
-                    if flights_added == self.config.connection_samples:
-                        break
+        for (event_time, curr_ant), next_flight in zip(events, next_flights):
+            self.global_time = event_time
+            self._make_next_flight(next_flight, curr_ant, get_results, results, origin, destination)
 
-        return available_flights
+        return len(events)
 
-    def _is_accessible_flight(self, curr_ant, flight):
-        if curr_ant.mode == 'NORMAL':
-            good_airport = curr_ant.curr_airport == flight['origin']
-            good_departure = curr_ant.curr_time + datetime.timedelta(minutes=self.config.min_conn_time) <= flight[
-                'departure_time']
-            good_arrival = flight['arrival_time'] <= self.config.max_time
-        else:  # curr_ant.mode == 'RETURN'
-            good_airport = curr_ant.curr_airport == flight['destination']
-            good_arrival = curr_ant.curr_time - datetime.timedelta(minutes=self.config.min_conn_time) >= flight['arrival_time']
-            good_departure = flight['departure_time'] >= self.config.min_time
+    def _run_events(self, origin, destination, get_results=False, results=None):
+        if self.config.batched:
+            return self._run_next_batch(origin, destination, get_results, results)
 
-        good_cost = curr_ant.curr_trav_cost + flight['price'] <= self.config.max_price
-        return good_airport and good_departure and good_arrival and good_cost
+        self._run_next_event(origin, destination, get_results, results)
+        return 1
+
+    ###
+    def _find_available_flights(self, curr_ant):
+        return self._find_available_flights_batch([curr_ant])[0]
+
+    def _find_available_flights_batch(self, ants):
+        # returns the candidate flights of all the ants concatenated, grouped by ant, and the index of the ant of every flight
+        flights, owners = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+
+        for mode in ['NORMAL', 'RETURN']:
+            members = np.array([i for i, curr_ant in enumerate(ants) if curr_ant.mode == mode], dtype=np.int64)
+            if len(members) > 0:
+                mode_flights, mode_owners = self._find_accessible(mode, [ants[i] for i in members])
+                flights.append(mode_flights)
+                owners.append(members[mode_owners])
+
+        flights, owners = np.concatenate(flights), np.concatenate(owners)
+        order = np.argsort(owners, kind='stable')
+
+        return flights[order], owners[order]
+
+    def _find_accessible(self, mode, ants):
+        # for every route of the airport of every ant the first `connection_samples` accessible flights are taken,
+        # the accessible ones form a range of the route sorted by departure (NORMAL) or arrival (RETURN)
+        # which is binary searched, all the routes of all the ants at once
+        table, samples = self.table, self.config.connection_samples
+        index = table.routes_by_departure if mode == 'NORMAL' else table.routes_by_arrival
+
+        airports = np.array([curr_ant.curr_airport for curr_ant in ants], dtype=np.int64)
+        times = np.array([curr_ant.curr_time for curr_ant in ants], dtype=np.int64)
+        budgets = np.array([self.config.max_price - curr_ant.curr_trav_cost for curr_ant in ants])
+
+        first, last = index.routes(airports)
+        counts = last - first
+        queries = np.repeat(np.arange(len(ants)), counts)  # ant of every (ant, route) query
+        routes = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - first, counts)
+
+        if mode == 'NORMAL':
+            start = index.search(routes, np.maximum(times + self.config.min_conn_time, self.min_time)[queries])
+            end = index.search(routes, np.full(len(routes), self.max_time), side='right')
+            position, step = start, 1
+            other_end_ok = lambda ids: table.arrival[ids] <= self.max_time
+        else:  # mode == 'RETURN'
+            start = index.search(routes, np.full(len(routes), self.min_time))
+            end = index.search(routes, np.minimum(times - self.config.min_conn_time, self.max_time)[queries], side='right')
+            position, step = end - 1, -1
+            other_end_ok = lambda ids: table.departure[ids] >= self.min_time
+
+        # the ranges are scanned in blocks, only the queries which still miss flights go on to the next block
+        found = np.zeros(len(routes), dtype=np.int64)
+        active = np.flatnonzero(start < end)
+        selected_queries, selected_flights, selected_order = [], [], []
+        offsets = np.arange(self.SCAN_BLOCK) * step
+        block = 0
+
+        while len(active) > 0:
+            positions = position[active, None] + offsets
+            inside = (start[active, None] <= positions) & (positions < end[active, None])
+            ids = index.ids[np.clip(positions, 0, len(index.ids) - 1)]
+
+            good = inside & (table.price[ids] <= budgets[queries[active], None]) & other_end_ok(ids)
+            ranks = np.cumsum(good, axis=1) + found[active, None]
+            taken = good & (ranks <= samples)
+
+            rows, cols = np.nonzero(taken)
+            selected_queries.append(active[rows])
+            selected_flights.append(ids[rows, cols])
+            selected_order.append(block * self.SCAN_BLOCK + cols)
+
+            found[active] = np.minimum(ranks[:, -1], samples)
+            position[active] += self.SCAN_BLOCK * step
+            active = active[(found[active] < samples) & inside[:, -1]]
+            block += 1
+
+        if not selected_queries:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        selected_queries = np.concatenate(selected_queries)
+        order = np.lexsort((np.concatenate(selected_order), selected_queries))
+
+        return np.concatenate(selected_flights)[order].astype(np.int64), queries[selected_queries[order]]
 
     ###
     def _update_pheromones(self, available_flights):
-        for airport, index, flight in available_flights:
-            time_gap = self.global_time - flight['pheromone_update_time']
-            flight['pheromone_level'] = flight['pheromone_level'] * (0.5) ** (time_gap // self.config.pheromone_updating_time)
-            flight['pheromone_update_time'] = self.global_time
+        return self.pheromones.evaluate(available_flights, self.global_time)
 
     ###
-    def _choose_flight(self, flights, curr_ant, origin, destination):
+    def _choose_flight(self, flights, pheromones, curr_ant, origin, destination):
         if len(flights) == 0:
             return None
 
-        for airport, index, flight in flights:
-            if curr_ant.mode == 'NORMAL' and airport == destination or curr_ant.mode == 'RETURN' and airport == origin:
-                if random.random() < self.config.direct_connection_impact:
-                    flight['pheromone_level'] += 1
-                    return airport, index, flight
-
-        waiting_times, prices, pheromones = np.empty(len(flights)), np.empty(len(flights)), np.empty(len(flights))
+        if curr_ant.mode == 'NORMAL':
+            airports, goal = self.table.destination[flights], destination
+            waiting_times = self.table.departure[flights] - (curr_ant.curr_time + self.config.min_conn_time)
+        else:  # curr_ant.mode == 'RETURN'
+            airports, goal = self.table.origin[flights], origin
+            waiting_times = (curr_ant.curr_time - self.config.min_conn_time) - self.table.arrival[flights]
 
-        min_time = curr_ant.curr_time + datetime.timedelta(
-            minutes=self.config.min_conn_time) if curr_ant.mode == 'NORMAL' else None
-        max_time = curr_ant.curr_time - datetime.timedelta(
-            minutes=self.config.min_conn_time) if curr_ant.mode == 'RETURN' else None
+        for flight in flights[airports == goal]:
+            if self.random.random() < self.config.direct_connection_impact:
+                self.pheromones.deposit(flight)
+                return flight
 
-        for index, (airport, flight_index, flight) in enumerate(flights):
-            if curr_ant.mode == 'NORMAL':
-                waiting_times[index] = (flight['departure_time'] - min_time).total_seconds() // 60
-            if curr_ant.mode == 'RETURN':
-                waiting_times[index] = (max_time - flight['arrival_time']).total_seconds() // 60
-            prices[index] = flight['price']
-            pheromones[index] = flight['pheromone_level']
+        waiting_times = waiting_times.astype(np.float64)
+        prices = self.table.price[flights]
 
         time_coeffs = (1 - np.nan_to_num(waiting_times / np.max(waiting_times))) ** 3
         prices_coeffs = (1 - np.nan_to_num(prices / np.max(prices))) ** 3
         pheromones_coeffs = np.nan_to_num(pheromones / np.max(pheromones))
 
+        time_impact, cost_impact, pheromone_impact = self._impacts()
+        combined_params = time_coeffs * time_impact + prices_coeffs * cost_impact + pheromones_coeffs * pheromone_impact
+
+        # roulette selection, the first flight whose cumulated weight reaches the drawn position
+        cumulated_params = np.cumsum(combined_params)
+        flight_pos = self.random.uniform(0, cumulated_params[-1])
+        flight = flights[min(np.searchsorted(cumulated_params, flight_pos), len(flights) - 1)]
+
+        self.pheromones.deposit(flight)
+        return flight
+
+    def _choose_flights(self, flights, owners, ants, origin, destination):
+        # vectorized version of _choose_flight for many ants, their candidate flights form one ragged array
+        # with a segment per ant, and all the reductions are done per segment
+        sizes = np.bincount(owners, minlength=len(ants))
+        next_flights = [None] * len(ants)
+
+        nonempty = np.flatnonzero(sizes)
+        if len(nonempty) == 0:
+            return next_flights
+
+        sizes = sizes[nonempty]
+        starts = np.r_[0, np.cumsum(sizes)[:-1]]
+        segments = np.repeat(np.arange(len(nonempty)), sizes)
+
+        normal = np.array([ants[i].mode == 'NORMAL' for i in nonempty])[segments]
+        curr_times = np.array([ants[i].curr_time for i in nonempty], dtype=np.int64)[segments]
+
+        airports = np.where(normal, self.table.destination[flights], self.table.origin[flights])
+        goals = np.where(normal, destination, origin)
+        waiting_times = np.where(
+            normal,
+            self.table.departure[flights] - (curr_times + self.config.min_conn_time),
+            (curr_times - self.config.min_conn_time) - self.table.arrival[flights]
+        ).astype(np.float64)
+
+        prices = self.table.price[flights]
+        pheromones = self.pheromones.evaluate(flights, self.global_time)
+
+        # direct connections, the first one per ant which passes the draw is taken
+        direct = (airports == goals) & (self.rng.random(len(flights)) < self.config.direct_connection_impact)
+        direct_pos = np.minimum.reduceat(np.where(direct, np.arange(len(flights)), len(flights)), starts)
+
+        def normalized(values):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.nan_to_num(values / np.maximum.reduceat(values, starts)[segments])
+
+        time_impact, cost_impact, pheromone_impact = self._impacts()
+        combined_params = (1 - normalized(waiting_times)) ** 3 * time_impact \
+            + (1 - normalized(prices)) ** 3 * cost_impact \
+            + normalized(pheromones) * pheromone_impact
+
+        # roulette selection within every segment on the global cumulated weights
+        cumulated_params = np.cumsum(combined_params)
+        segment_offsets = np.r_[0, cumulated_params][starts]
+        segment_totals = np.add.reduceat(combined_params, starts)
+
+        positions = segment_offsets + self.rng.random(len(starts)) * segment_totals
+        chosen = np.clip(np.searchsorted(cumulated_params, positions), starts, starts + sizes - 1)
+        chosen = np.where(direct_pos < len(flights), direct_pos, chosen)
+
+        chosen_flights = flights[chosen]
+        self.pheromones.deposit_many(chosen_flights)
+
+        for i, flight in zip(nonempty, chosen_flights.tolist()):
+            next_flights[i] = flight
+
+        return next_flights
+
+    def _impacts(self):
         pheromone_impact = self.config.pheromone_impact
         time_impact = self.config.time_impact_nodes * (1 - pheromone_impact)
         cost_impact = 1 - self.config.pheromone_impact - time_impact
-        combined_params = time_coeffs * time_impact + prices_coeffs * cost_impact + pheromones_coeffs * pheromone_impact
-
-        flight_pos = random.uniform(0, sum(combined_params))
-        for flight, params in zip(flights, combined_params):
-            if params >= flight_pos:
-                flight[2]['pheromone_level'] += 1
-                return flight
-            flight_pos -= params
+        return time_impact, cost_impact, pheromone_impact
 
     ###
     def _make_next_flight(self, next_flight, curr_ant, get_results, results, origin, destination):
@@ -168,31 +316,43 @@ class AntColonyAlgorithm:
 
         else:
             if curr_ant.mode == 'NORMAL':
-                time_diff = (next_flight[2]['arrival_time'] - curr_ant.curr_time).total_seconds() // 60
+                time_diff = int(self.table.arrival[next_flight]) - curr_ant.curr_time
             else:  # curr_ant.mode == 'RETURN'
-                time_diff = (curr_ant.curr_time - next_flight[2]['departure_time']).total_seconds() // 60
+                time_diff = curr_ant.curr_time - int(self.table.departure[next_flight])
             new_time = self.global_time + time_diff
 
-            curr_ant.update(next_flight)
-            if curr_ant.mode == 'NORMAL' and next_flight[0] == destination:
+            curr_ant.update(self.table, next_flight)
+            if curr_ant.mode == 'NORMAL' and curr_ant.curr_airport == destination:
+                self._update_best_trail(curr_ant)
                 if get_results:
-                    results.append((curr_ant.curr_trav_cost, curr_ant.curr_conn_numb, curr_ant.path))
+                    results.append((curr_ant.curr_trav_cost, curr_ant.curr_conn_numb, list(curr_ant.path)))
                     self._spawn_ant(origin)
                 else:
                     curr_ant.curr_trav_cost = 0
                     curr_ant.curr_conn_numb = 0
                     curr_ant.mode = 'RETURN'
-                    self.events.put((new_time, curr_ant))
-            elif curr_ant.mode == 'RETURN' and next_flight[0] == origin:
+                    self.events.push(new_time, curr_ant)
+            elif curr_ant.mode == 'RETURN' and curr_ant.curr_airport == origin:
                 self._spawn_ant(origin)
             else:
-                self.events.put((new_time, curr_ant))
+                self.events.push(new_time, curr_ant)
 
     def _spawn_ant(self, origin):
         time_available_min = int((self.config.max_time - self.config.min_time).total_seconds() // 60)
-        ant_spawn_gap = random.randint(0, time_available_min)
-        self.events.put(
-            (self.global_time + 1, Ant(self.config.min_time + datetime.timedelta(minutes=ant_spawn_gap), origin)))
+        ant_spawn_gap = self.random.randint(0, time_available_min)
+        self.events.push(self.global_time + 1, Ant(to_minutes(self.config.min_time) + ant_spawn_gap, origin))
+
+    def _path_cost(self, path):
+        # same scalarization as the one used to choose the final result, but on absolute values
+        duration = int(self.table.arrival[path[-1]]) - int(self.table.departure[path[0]])
+        price = float(self.table.price[path].sum())
+        return duration * self.config.time_impact_choice + price * (1 - self.config.time_impact_choice)
+
+    def _update_best_trail(self, curr_ant):
+        cost = self._path_cost(curr_ant.path)
+
+        if self.best_trail is None or cost < self.best_trail[0]:
+            self.best_trail = (cost, list(curr_ant.path))
 
     ###
     def _find_best_result(self, results):
@@ -200,7 +360,7 @@ class AntColonyAlgorithm:
 
         for index, result in enumerate(results):
             costs[index] = result[0]
-            total_times[index] = (result[2][-1].arrival - result[2][0].departure).total_seconds() // 60
+            total_times[index] = self.table.arrival[result[2][-1]] - self.table.departure[result[2][0]]
 
         costs = np.nan_to_num(costs / np.max(costs))
         total_times = np.nan_to_num(total_times / np.max(total_times))
@@ -212,14 +372,121 @@ class AntColonyAlgorithm:
 
     ###
     def run(self, origin: Airport, destination: Airport):
-        self.clean_pheromones(self.net.ant_graph)
+        with tqdm(total=self.config.iters_numb) as bar:
+            for progress in self.iterate(origin, destination):
+                bar.update(progress.iteration - bar.n)
 
-        self._init_ants(origin)
+        return progress.path
+
+    def iterate(self, origin: Airport, destination: Airport, report_every: int = 1000, time_budget: Optional[float] = None,
+                patience: Optional[int] = None) -> Iterator[Progress]:
+        '''
+        Runs the algorithm and every `report_every` events yields the best path found so far. The run stops early
+        after `time_budget` seconds or `patience` events without an improvement, the last report holds the result.
+        The result is the better (by the cost of the reports) of the best sampled path and the best path found so far,
+        when the time is out only the latter.
+        When the destination is not reached at all, the path of the last report is None.
+        '''
+        origin, destination = self.table.airport_id(origin), self.table.airport_id(destination)
+        self._start(origin, destination)
 
-        for _ in trange(self.config.iters_numb):
-            self._run_next_event(origin, destination)
+        stop = StopCondition(time_budget, patience)
+        done, next_report = 0, report_every
+
+        while done < self.config.iters_numb and not stop.should_stop(done):
+            done += self._run_events(origin, destination)
+
+            if self.best_trail is not None:
+                stop.update(done, self.best_trail[0])
+
+            if done >= next_report:
+                next_report = done + report_every
+                yield self._progress(done, stop)
 
         results = []
-        while len(results) < self.config.result_samples:
-            self._run_next_event(origin, destination, True, results)
-        return self._find_best_result(results)
+        if not stop.expired() or self.best_trail is None:
+            results = self._collect_results(origin, destination, self.config.result_samples, stop)
+
+        # the sampled result is kept only if it is not worse than the best path found so far,
+        # so that the last report never takes back an improvement shown by the earlier ones
+        candidates = [self._find_best_result(results)] if results else []
+        if self.best_trail is not None:
+            candidates.append(self.best_trail[1])
+        path = min(candidates, key=self._path_cost) if candidates else None
+
+        self._finish(origin, destination)
+        if path is None:
+            yield Progress(None, float('inf'), done, self.config.iters_numb, stop.elapsed, finished=True)
+        else:
+            yield Progress(
+                [self.table.flight(flight_id) for flight_id in path], self._path_cost(path),
+                done, self.config.iters_numb, stop.elapsed, finished=True
+            )
+
+    def _progress(self, done, stop):
+        if self.best_trail is None:
+            return Progress(None, float('inf'), done, self.config.iters_numb, stop.elapsed)
+
+        cost, path = self.best_trail
+        return Progress([self.table.flight(flight_id) for flight_id in path], cost, done, self.config.iters_numb, stop.elapsed)
+
+    def run_many(self, queries: Iterable[tuple], workers: Optional[int] = None) -> Iterator[Tuple[int, Optional[List[Flight]]]]:
+        '''
+        Runs many queries, (origin, destination) pairs or (origin, destination, configuration) triples, and yields
+        (query index, path) pairs as they finish. Queries with the same time window and origin are run one after
+        another by the same algorithm object, with `workers` processes the groups are run in parallel.
+        '''
+        groups = group_queries(queries, self.config, lambda configuration: (configuration.min_time, configuration.max_time))
+        return run_groups(AntColonyAlgorithm, self.net, groups, workers)
+
+    def run_colonies(self, origin: Airport, destination: Airport, colonies: int, exchange_every: Optional[int] = None,
+                     seed: Optional[int] = None, time_budget: Optional[float] = None) -> Optional[List[Flight]]:
+        '''
+        Runs `colonies` independent colonies with different seeds, each one in its own process, and chooses
+        the best result out of all their results. With `exchange_every` the colonies stop every that many events
+        and the best trail of every colony is laid down in all the other ones. None when no colony reached the destination.
+        '''
+        from .colonies import run_colonies
+
+        origin, destination = self.table.airport_id(origin), self.table.airport_id(destination)
+        results = run_colonies(self.net, self.config, origin, destination, colonies, exchange_every, seed, time_budget)
+        if not results:
+            return None
+
+        return [self.table.flight(flight_id) for flight_id in self._find_best_result(results)]
+
+    def _start(self, origin, destination):
+        self.clean_pheromones()
+        self.events.clear()
+        self.global_time = 0
+
+        if self.config.warm_start:
+            snapshot = self.pheromone_cache.get(self._pheromones_key(origin, destination))
+            if snapshot is not None:
+                self.pheromones.restore(*snapshot)
+
+        self._init_ants(origin)
+
+    def _finish(self, origin, destination):
+        if self.config.warm_start:
+            self.pheromone_cache.put(self._pheromones_key(origin, destination), self.pheromones.snapshot(self.global_time))
+
+    def _pheromones_key(self, origin, destination):
+        return self.net.version, origin, destination, self.min_time, self.max_time
+
+    def _run_iterations(self, origin, destination, iterations, stop=None):
+        processed = 0
+        while processed < iterations and not (stop is not None and stop.expired()):
+            processed += self._run_events(origin, destination)
+        return processed
+
+    def _collect_results(self, origin, destination, samples, stop=None):
+        # sampling ends early when the time is out or no result comes within `iters_numb` events,
+        # e.g. when the destination cannot be reached, then fewer (or no) results are returned
+        results, idle = [], 0
+        while len(results) < samples and idle < max(self.config.iters_numb, 1) and not (stop is not None and stop.expired()):
+            found = len(results)
+            idle += self._run_events(origin, destination, True, results)
+            if len(results) > found:
+                idle = 0
+        return results[:samples]
@@ -0,0 +1,134 @@
+from typing import Optional, List
+import multiprocessing
+import time
+
+import numpy as np
+
+from .configuration import AntColonyConfiguration
+from ..data import Network
+from ..progress import StopCondition
+
+
+# seconds a colony may answer late, over the time budget, before it is given up
+ANSWER_GRACE = 5.0
+
+
+def colony_seeds(colonies: int, seed: Optional[int] = None) -> List[int]:
+    # independent streams for the colonies, reproducible when the seed is given
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(colonies)]
+
+
+def _colony_worker(network, configuration, seed, origin, destination, time_budget, connection):
+    from .algorithm import AntColonyAlgorithm
+
+    algorithm = AntColonyAlgorithm(network, configuration, seed)
+    algorithm._start(origin, destination)
+    stop = StopCondition(time_budget)
+
+    try:
+        while True:
+            command, argument = connection.recv()
+
+            if command == 'run':
+                iterations, trails = argument
+                algorithm.reinforce_trails(trails)
+                algorithm._run_iterations(origin, destination, iterations, stop)
+                connection.send(algorithm.best_trail)
+
+            elif command == 'results':
+                results = algorithm._collect_results(origin, destination, argument, stop)
+                if not results and algorithm.best_trail is not None:
+                    # in the form of the sampled results, (price, flights, flight ids), the trail holds the scalarized cost
+                    path = algorithm.best_trail[1]
+                    results = [(float(algorithm.table.price[path].sum()), len(path), path)]
+                connection.send(results)
+                return
+    finally:
+        connection.close()
+
+
+def _receive(connection, deadline):
+    # (True, answer) of a colony, (False, None) when the answer does not come before the deadline or the colony is gone
+    timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+    try:
+        if connection.poll(timeout):
+            return True, connection.recv()
+    except (EOFError, OSError):
+        pass
+    return False, None
+
+
+def run_colonies(
+    network: Network,
+    configuration: AntColonyConfiguration,
+    origin: int,
+    destination: int,
+    colonies: int,
+    exchange_every: Optional[int] = None,
+    seed: Optional[int] = None,
+    time_budget: Optional[float] = None
+) -> list:
+    '''
+    Runs independent colonies over the same network in separate processes and returns all their results
+    concatenated, as (cost, connections, flight ids) tuples. Every colony collects `result_samples` results,
+    or fewer when its `time_budget` (in seconds) runs out, colonies which do not answer in time are left out.
+    '''
+    if colonies < 1:
+        raise ValueError('at least one colony is required')
+
+    context = multiprocessing.get_context()
+    connections, processes = [], []
+
+    for colony_seed in colony_seeds(colonies, seed):
+        parent, child = context.Pipe()
+        process = context.Process(
+            target=_colony_worker,
+            args=(network, configuration, colony_seed, origin, destination, time_budget, child),
+            daemon=True
+        )
+        process.start()
+        child.close()
+
+        connections.append(parent)
+        processes.append(process)
+
+    try:
+        deadline = None if time_budget is None else time.monotonic() + time_budget + ANSWER_GRACE
+        step = max(exchange_every or configuration.iters_numb, 1)
+        trails = [None] * colonies
+        alive = list(range(colonies))
+
+        for done in range(0, configuration.iters_numb, step):
+            iterations = min(step, configuration.iters_numb - done)
+
+            for index in alive:
+                # every colony gets the best trails of all the other ones
+                others = [trail for other, trail in enumerate(trails) if other != index and trail is not None]
+                connections[index].send(('run', (iterations, others)))
+
+            # colonies which do not answer are not asked anymore, their late answers would mix up the next ones
+            answered = []
+            for index in alive:
+                received, trails[index] = _receive(connections[index], deadline)
+                if received:
+                    answered.append(index)
+            alive = answered
+
+        for index in alive:
+            connections[index].send(('results', configuration.result_samples))
+
+        results = []
+        for index in alive:
+            received, colony_results = _receive(connections[index], deadline)
+            if received:
+                results.extend(colony_results)
+
+        return results
+
+    finally:
+        for connection in connections:
+            connection.close()
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
@@ -40,4 +40,12 @@ class AntColonyConfiguration:
     pheromone_updating_time: int
 
     # cost function parameter
-    time_impact_choice: float
\ No newline at end of file
+    time_impact_choice: float
+
+    # engine parameters, in the batched mode all the events within `batch_window` minutes
+    # of the simulation time are processed at once with vectorized flight choice
+    batched: bool = False
+    batch_window: float = 1
+
+    # runs on the same network, route and time window start from the pheromones left by the previous one
+    warm_start: bool = False
\ No newline at end of file
@@ -0,0 +1,34 @@
+from typing import Iterable, Tuple, Any
+from itertools import count
+import heapq
+
+
+class EventScheduler:
+    '''
+    Min-heap of (time, sequence number, ant) events. The sequence number makes events with the same time
+    leave in the insertion order, so ants themselves are never compared. Not thread-safe, it does not need to be.
+    '''
+
+    def __init__(self) -> None:
+        self._heap = []
+        self._counter = count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, time: float, ant: Any) -> None:
+        heapq.heappush(self._heap, (time, next(self._counter), ant))
+
+    def push_many(self, events: Iterable[Tuple[float, Any]]) -> None:
+        self._heap.extend((time, next(self._counter), ant) for time, ant in events)
+        heapq.heapify(self._heap)
+
+    def pop(self) -> Tuple[float, Any]:
+        time, _, ant = heapq.heappop(self._heap)
+        return time, ant
+
+    def peek_time(self) -> float:
+        return self._heap[0][0]
+
+    def clear(self) -> None:
+        self._heap.clear()
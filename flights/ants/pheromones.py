@@ -0,0 +1,66 @@
+from typing import Tuple, Set
+
+import numpy as np
+
+
+class Pheromones:
+    '''
+    Pheromone levels of all the flights of a table, indexed by the flight id. The level of a flight halves every
+    `halving_time` minutes, which is applied lazily whenever the flight is evaluated. A reset only starts a new
+    epoch, entries written in the previous epochs are treated as empty. Flights which got any pheromone in the current
+    epoch are remembered, so that a snapshot costs as much as the flights visited, not the size of the table.
+    '''
+
+    def __init__(self, size: int, halving_time: int) -> None:
+        self._halving_time = halving_time
+
+        # zeroed arrays are allocated lazily by the OS, untouched flights cost nothing
+        self._level = np.zeros(size, dtype=np.float64)
+        self._update_time = np.zeros(size, dtype=np.float64)
+        self._epoch = np.zeros(size, dtype=np.int32)
+        self._current_epoch = 1
+
+        # ids of the flights deposited on in the current epoch
+        self._deposited: Set[int] = set()
+
+    def reset(self) -> None:
+        self._current_epoch += 1
+        self._deposited = set()
+
+    def evaluate(self, ids: np.ndarray, time: float) -> np.ndarray:
+        # decays the levels of the given flights up to the given time and returns them
+        fresh = self._epoch[ids] == self._current_epoch
+        halvings = (time - self._update_time[ids]) // self._halving_time
+
+        levels = np.where(fresh, self._level[ids] * 0.5 ** halvings, 0)
+
+        self._level[ids] = levels
+        self._update_time[ids] = time
+        self._epoch[ids] = self._current_epoch
+
+        return levels
+
+    def deposit(self, id: int, amount: float = 1) -> None:
+        # flights are always evaluated before they are chosen, so the entry belongs to the current epoch
+        self._level[id] += amount
+        self._deposited.add(int(id))
+
+    def deposit_many(self, ids: np.ndarray, amount: float = 1) -> None:
+        np.add.at(self._level, ids, amount)
+        self._deposited.update(np.asarray(ids).tolist())
+
+    def snapshot(self, time: float) -> Tuple[np.ndarray, np.ndarray]:
+        # ids and levels, decayed up to the given time, of all the flights holding any pheromone
+        ids = np.sort(np.fromiter(self._deposited, dtype=np.int64, count=len(self._deposited)))
+        levels = self.evaluate(ids, time)
+
+        return ids[levels > 0], levels[levels > 0]
+
+    def restore(self, ids: np.ndarray, levels: np.ndarray, time: float = 0) -> None:
+        # starts a new epoch holding the given levels, as of the given time
+        self.reset()
+
+        self._level[ids] = levels
+        self._update_time[ids] = time
+        self._epoch[ids] = self._current_epoch
+        self._deposited = set(np.asarray(ids).tolist())
@@ -0,0 +1,98 @@
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .data import Network, Airport, Flight, FlightTable
+from .reader import Reader
+
+
+# (query index, origin, destination, configuration)
+Task = Tuple[int, Airport, Airport, Any]
+
+_worker_network: Optional[Network] = None
+
+
+def group_queries(queries: Iterable[tuple], configuration: Any, window: Callable[[Any], tuple]) -> List[List[Task]]:
+    '''
+    Queries are (origin, destination) pairs, which use the given configuration, or (origin, destination, configuration)
+    triples. They are grouped by the time window of their configuration and then by the origin, so that the runs
+    of a group share one algorithm object, with its filtered network and the indexes built on it.
+    '''
+    groups = defaultdict(list)
+
+    for index, (origin, destination, *rest) in enumerate(queries):
+        query_configuration = rest[0] if rest else configuration
+        groups[(window(query_configuration), origin.codename)].append((index, origin, destination, query_configuration))
+
+    return [groups[key] for key in sorted(groups)]
+
+
+def solve_group(algorithm_class: type, network: Network, group: List[Task]) -> Iterator[Tuple[int, Optional[List[Flight]]]]:
+    algorithm = None
+
+    for index, origin, destination, configuration in group:
+        if algorithm is None:
+            algorithm = algorithm_class(network, configuration)
+        else:
+            algorithm.reconfigure(configuration)
+
+        for progress in algorithm.iterate(origin, destination):
+            pass
+
+        yield index, progress.path
+
+
+def load_network(path: str) -> Network:
+    # binary networks are memory-mapped, so all the processes opening them share the pages
+    if Path(path).is_dir():
+        return Reader.read_network_binary(path)
+    return Reader.read_network_pickled(path)
+
+
+def init_worker(network: Union[Network, str]) -> None:
+    '''
+    Initializer of the worker processes. Given a path the worker opens the network itself, instead of receiving a copy of it.
+    '''
+    global _worker_network
+    _worker_network = load_network(network) if isinstance(network, str) else network
+
+
+def worker_network() -> Network:
+    return _worker_network
+
+
+def path_ids(path: Optional[List[Flight]]) -> Optional[List[int]]:
+    # paths are sent back from the workers as flight ids, sending the flights would send the whole table
+    return None if path is None else [flight.id for flight in path]
+
+
+def path_flights(table: FlightTable, ids: Optional[List[int]]) -> Optional[List[Flight]]:
+    return None if ids is None else [table.flight(i) for i in ids]
+
+
+def _solve_group_ids(algorithm_class: type, group: List[Task]) -> List[Tuple[int, Optional[List[int]]]]:
+    return [(index, path_ids(path)) for index, path in solve_group(algorithm_class, _worker_network, group)]
+
+
+def run_groups(
+    algorithm_class: type,
+    network: Network,
+    groups: List[List[Task]],
+    workers: Optional[int] = None
+) -> Iterator[Tuple[int, Optional[List[Flight]]]]:
+    '''
+    Yields (query index, path) pairs as the queries finish. With more than one worker the groups are spread
+    over a process pool holding the network, and the results of a group come back once the whole group is done.
+    '''
+    if workers is None or workers <= 1:
+        for group in groups:
+            yield from solve_group(algorithm_class, network, group)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(network,)) as executor:
+        futures = [executor.submit(_solve_group_ids, algorithm_class, group) for group in groups]
+
+        for future in as_completed(futures):
+            for index, ids in future.result():
+                yield index, path_flights(network.table, ids)
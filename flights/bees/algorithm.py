@@ -1,21 +1,25 @@
 from __future__ import annotations
 
 from operator import attrgetter
-from typing import List, Iterator, Optional
+from typing import List, Iterator, Iterable, Optional, Tuple
 from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
 from copy import copy
 
-from tqdm import trange
+import numpy as np
+from tqdm import tqdm
 
+from ..batch import group_queries, run_groups, init_worker, worker_network, path_ids, path_flights
 from ..data import Network, Flight, Airport
+from ..progress import Progress, StopCondition
 from .configuration import BeeColonyConfiguration
 
 
 class SolutionPath:
-    def __init__(self, algorithm: BeeColonyAlgorithm, path: List[Flight]) -> None:
+    def __init__(self, algorithm: BeeColonyAlgorithm, path: List[Flight], cost: Optional[float] = None) -> None:
         if path is not None:
             self._path = copy(path)
-            self._cost = algorithm.cost_function(path)
+            self._cost = algorithm.cost_function(path) if cost is None else cost
         else:
             self._path = None
             self._cost = float('inf')
@@ -45,6 +49,10 @@ class Neighborhood:
         self._center_path: SolutionPath = path
         self._frozen_flights: List[Flight] = [path[0]]
 
+        # the frozen flights do not change while they are frozen, so their part of the cost is kept aside
+        self._frozen_price = path[0].price
+        self._journey_start = path[0].departure
+
         self._foragers = 0
         self._times_shrunk = 0
         self._abandoned = False
@@ -76,43 +84,67 @@ class Neighborhood:
 
         newly_frozen_flight = self._center_path[len(self._frozen_flights)]
         self._frozen_flights.append(newly_frozen_flight)
+        self._frozen_price += newly_frozen_flight.price
 
         self._times_shrunk += 1
         
         if self._times_shrunk >= self._algorithm.configuration.max_shrinkages:
             self._abandoned = True
         
+    def searches(self) -> List[dict]:
+        # arguments of the random_dfs_search of every forager, only the paths which can beat the center are searched
+        conf = self._algorithm.configuration
+        frozen_origin = self._frozen_flights[-1].destination
+
+        search = dict(
+            source=frozen_origin,
+            target=self._center_path[-1].destination,
+            time_offset=self._frozen_flights[-1].arrival + frozen_origin.transfer_time,
+            max_depth=conf.max_transfers + 1 - len(self._frozen_flights),
+            max_cost=conf.max_cost - self._frozen_price,
+            max_score=self.best_cost - self._frozen_price * (1 - conf.time_priority),
+            time_priority=conf.time_priority,
+            journey_start=self._journey_start
+        )
+
+        return [search] * self._foragers
+
     def local_search(self) -> None:
-        net = self._algorithm.network
+        self.update(self._algorithm.search_paths(self.searches()))
+
+    def update(self, extended_paths: List[Optional[List[Flight]]]) -> None:
         improved = False
         
-        for _ in range(self._foragers):
-            frozen_origin = self._frozen_flights[-1].destination
-            
-            extended_path = net.random_dfs_search(
-                frozen_origin,
-                self._center_path[-1].destination,
-                self._frozen_flights[-1].arrival + frozen_origin.transfer_time,
-                self._algorithm.configuration.max_transfers + 1,
-                self._algorithm.configuration.max_cost
-            )
-
+        for extended_path in extended_paths:
             if extended_path is None:
                 continue
 
-            path = self._frozen_flights + extended_path
-            
-            if path is not None:
-                solution = SolutionPath(self._algorithm, path)
-                
-                if solution.cost < self.best_cost:
-                    self._center_path = solution
-                    improved = True
+            # only the extension is scored, the whole path is built once it beats the center
+            arrival = (extended_path or self._frozen_flights)[-1].arrival
+            cost = self._algorithm.combined_cost(
+                self._frozen_price + sum(flight.price for flight in extended_path),
+                (arrival - self._journey_start) // timedelta(minutes=1)
+            )
+
+            if cost < self.best_cost:
+                self._center_path = SolutionPath(self._algorithm, self._frozen_flights + extended_path, cost)
+                improved = True
                 
         if not improved:
             self.shrink()
             
 
+def _search_ids(network: Network, task: tuple) -> Optional[List[int]]:
+    method, search, seed = task
+    rng = None if seed is None else np.random.default_rng(seed)
+
+    return path_ids(getattr(network, method)(**search, rng=rng))
+
+
+def _worker_search(task: tuple) -> Optional[List[int]]:
+    return _search_ids(worker_network(), task)
+
+
 class BeeColonyAlgorithm:
     def __init__(
         self,
@@ -121,8 +153,13 @@ class BeeColonyAlgorithm:
     ) -> None:
         
         self._configuration = configuration
+        self._full_network = network
         self._network = network.filter_by_date(configuration.from_datetime, configuration.to_datetime)
 
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._entropy: Optional[int] = configuration.seed
+        self._searches_count = 0
+
     @property
     def network(self) -> Network:
         return self._network
@@ -131,41 +168,125 @@ class BeeColonyAlgorithm:
     def configuration(self) -> BeeColonyConfiguration:
         return self._configuration
         
+    def reconfigure(self, configuration: BeeColonyConfiguration) -> None:
+        # the filtered network is kept for the next runs, unless the time window changes
+        if (configuration.from_datetime, configuration.to_datetime) != \
+                (self._configuration.from_datetime, self._configuration.to_datetime):
+            self._network = self._full_network.filter_by_date(configuration.from_datetime, configuration.to_datetime)
+
+        self._configuration = configuration
+        self._entropy = configuration.seed
+
     def cost_function(self, path: List[Flight]) -> float:
         overall_time = (path[-1].arrival - path[0].departure) // timedelta(minutes=1)
         overall_price = sum(flight.price for flight in path)
         
+        return self.combined_cost(overall_price, overall_time)
+
+    def combined_cost(self, overall_price: float, overall_time: int) -> float:
         tp = self._configuration.time_priority
         # TODO how do we scale time and price
         return overall_price * (1 - tp) + (overall_time) * tp
         
+    def search_paths(self, searches: List[dict], method: str = 'random_dfs_search') -> List[Optional[List[Flight]]]:
+        '''
+        Runs the given search method of the network for every dict of keyword arguments, in the worker pool
+        if there is one. With a seed every search gets its own random stream, numbered in the order of the searches,
+        so the results do not depend on the number of workers.
+        '''
+        if self._entropy is None and self._executor is None:
+            return [getattr(self._network, method)(**search) for search in searches]
+
+        seeds = [(self._entropy, self._searches_count + i) for i in range(len(searches))]
+        self._searches_count += len(searches)
+        tasks = [(method, search, seed) for search, seed in zip(searches, seeds)]
+
+        if self._executor is None:
+            results = [_search_ids(self._network, task) for task in tasks]
+        else:
+            chunksize = max(1, len(tasks) // (4 * self._configuration.workers))
+            results = self._executor.map(_worker_search, tasks, chunksize=chunksize)
+
+        table = self._network.table
+        return [path_flights(table, ids) for ids in results]
+
     def global_search(self, source: Airport, target: Airport) -> Optional[Neighborhood]:
-        path = self._network.random_dfs_search(
-            source,
-            target,
+        return self.global_searches(source, target, 1)[0]
+
+    def global_searches(self, source: Airport, target: Airport, count: int) -> List[Optional[Neighborhood]]:
+        search = dict(
+            source=source,
+            target=target,
             max_depth=self.configuration.max_transfers + 1,
             max_cost=self.configuration.max_cost
         )
 
-        if path is None:
-            return None
-
-        return Neighborhood(
-            self,
-            SolutionPath(self, path)
-        )
+        return [
+            None if path is None else Neighborhood(self, SolutionPath(self, path))
+            for path in self.search_paths([search] * count, 'random_bidirectional_search')
+        ]
         
     def run(self, source: Airport, target: Airport) -> Optional[List[Flight]]:
+        with tqdm(total=self._configuration.iterations) as bar:
+            for progress in self.iterate(source, target):
+                bar.update(progress.iteration - bar.n)
+
+        return progress.path
+
+    def run_many(self, queries: Iterable[tuple], workers: Optional[int] = None) -> Iterator[Tuple[int, Optional[List[Flight]]]]:
+        '''
+        Runs many queries, (source, target) pairs or (source, target, configuration) triples, and yields
+        (query index, path) pairs as they finish. Queries with the same time window and source are run one after
+        another by the same algorithm object, with `workers` processes the groups are run in parallel.
+        '''
+        groups = group_queries(
+            queries,
+            self._configuration,
+            lambda configuration: (configuration.from_datetime, configuration.to_datetime)
+        )
+        return run_groups(BeeColonyAlgorithm, self._full_network, groups, workers)
+
+    def iterate(
+        self,
+        source: Airport,
+        target: Airport,
+        report_every: int = 1,
+        time_budget: Optional[float] = None,
+        patience: Optional[int] = None
+    ) -> Iterator[Progress]:
+        '''
+        Runs the algorithm and every `report_every` iterations yields the best path found so far. The run stops early
+        after `time_budget` seconds or `patience` iterations without an improvement, the last report holds the result.
+        '''
+        conf = self._configuration
+        stop = StopCondition(time_budget, patience)
+
+        if conf.workers > 1:
+            self._executor = ProcessPoolExecutor(conf.workers, initializer=init_worker, initargs=(self._network,))
+            if self._entropy is None:
+                self._entropy = np.random.SeedSequence().entropy
+
+        try:
+            yield from self._iterate(source, target, report_every, stop)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+            self._entropy = conf.seed
+
+    def _iterate(self, source: Airport, target: Airport, report_every: int, stop: StopCondition) -> Iterator[Progress]:
         conf = self._configuration
 
         if self.global_search(source, target) is None:
-            return None
+            yield Progress(None, float('inf'), 0, conf.iterations, stop.elapsed, finished=True)
+            return
         
-        sites = [self.global_search(source, target) for _ in range(conf.scout_bees)]
+        sites = self.global_searches(source, target, conf.scout_bees)
         sites = [site for site in sites if site is not None]
         best_path = sites[0].best_path
+        iteration = 0
         
-        for _ in trange(conf.iterations):
+        while iteration < conf.iterations and not stop.should_stop(iteration):
             sorted_sites = sorted(sites, key=attrgetter('best_cost'))[:conf.best_sites]
             
             if sorted_sites[0].best_cost < best_path.cost:
@@ -179,19 +300,27 @@ class BeeColonyAlgorithm:
             for site in rest_sites:
                 site.recruit(conf.rest_sites_bees)
                 
-            for site in sorted_sites:
-                site.local_search()
+            # the searches of all the sites are run at once and handed back to the sites in order
+            searches = [site.searches() for site in sorted_sites]
+            paths = self.search_paths([search for site_searches in searches for search in site_searches])
+
+            start = 0
+            for site, site_searches in zip(sorted_sites, searches):
+                site.update(paths[start:start + len(site_searches)])
+                start += len(site_searches)
                 
             # constructing list of sites for the next iteration
             left_sites = [
                 site for site in sorted_sites if not site.abandoned
             ]
             
-            new_sites = [
-                self.global_search(source, target)
-                for _ in range(conf.scout_bees - len(left_sites))
-            ]
+            new_sites = self.global_searches(source, target, max(conf.scout_bees - len(left_sites), 0))
             
             sites = left_sites + [new_site for new_site in new_sites if new_site is not None]
+            iteration += 1
+            stop.update(iteration, best_path.cost)
+
+            if iteration % report_every == 0 and iteration < conf.iterations:
+                yield Progress(best_path.path, best_path.cost, iteration, conf.iterations, stop.elapsed)
             
-        return best_path.path
+        yield Progress(best_path.path, best_path.cost, iteration, conf.iterations, stop.elapsed, finished=True)
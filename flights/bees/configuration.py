@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Optional
 
 
 @dataclass
@@ -25,3 +26,8 @@ class BeeColonyConfiguration:
     rest_sites_bees: int
         
     max_shrinkages: int
+
+    # execution parameters, with more than one worker the searches of every iteration run in a process pool,
+    # the seed makes the runs reproducible regardless of the number of workers
+    workers: int = 1
+    seed: Optional[int] = None
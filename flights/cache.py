@@ -0,0 +1,149 @@
+from collections import OrderedDict
+from dataclasses import is_dataclass, fields
+from datetime import datetime, timedelta
+from typing import Any, Callable, Hashable, Optional
+import hashlib
+import json
+import time
+
+import numpy as np
+
+
+class LRUCache:
+    '''
+    Mapping bounded by the number of entries and optionally by their total size, as estimated by `sizeof`,
+    the least recently used entries are evicted first. With `ttl` the entries expire that many seconds after
+    they are put.
+    '''
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError('cache must be able to hold at least one entry')
+
+        if max_bytes is not None and sizeof is None:
+            raise ValueError('sizeof is required to bound the cache by size')
+
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._sizes: dict = {}
+        self._bytes = 0
+
+        self._ttl = ttl
+        self._clock = clock
+        self._expires: dict = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._alive(key)
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries
+
+    @property
+    def max_bytes(self) -> Optional[int]:
+        return self._max_bytes
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def _alive(self, key: Hashable) -> bool:
+        if key not in self._entries:
+            return False
+
+        if self._ttl is not None and self._expires[key] <= self._clock():
+            self.pop(key)
+            return False
+
+        return True
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        if not self._alive(key):
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self.pop(key)
+
+        size = self._sizeof(value) if self._sizeof is not None else 0
+        if self._max_bytes is not None and size > self._max_bytes:
+            return  # it would evict everything and still not fit
+
+        self._entries[key] = value
+        self._sizes[key] = size
+        self._bytes += size
+
+        if self._ttl is not None:
+            self._expires[key] = self._clock() + self._ttl
+
+        while len(self._entries) > self._max_entries or (self._max_bytes is not None and self._bytes > self._max_bytes):
+            self.pop(next(iter(self._entries)))
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        if key not in self._entries:
+            return default
+
+        self._bytes -= self._sizes.pop(key)
+        self._expires.pop(key, None)
+        return self._entries.pop(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._sizes.clear()
+        self._expires.clear()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+
+def _canonical(value: Any) -> Any:
+    # json compatible form of the value, the same for equal values in every process
+    if is_dataclass(value):
+        return {'type': type(value).__name__, **{field.name: _canonical(getattr(value, field.name)) for field in fields(value)}}
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in value.items()}
+    if hasattr(value, 'codename'):  # airports and airlines
+        return value.codename
+
+    return value
+
+
+def canonical_key(*values: Any) -> str:
+    '''
+    Stable hash of the given values, which can be dataclasses (e.g. configurations), airports, dates and plain values.
+    '''
+    return hashlib.sha1(json.dumps(_canonical(values), sort_keys=True).encode()).hexdigest()
+
+
+def query_key(network: Any, configuration: Any, origin: Any, destination: Any, *options: Any) -> str:
+    # results of a query hold as long as the network, the configuration, the airports and the run options are the same
+    return canonical_key(network.version, configuration, origin, destination, *options)
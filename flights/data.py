@@ -1,13 +1,21 @@
 from __future__ import annotations
 
-from typing import Optional, List, Dict
+from typing import TYPE_CHECKING, Optional, List, Dict, Tuple, NamedTuple
 from datetime import datetime, timedelta
 from collections import defaultdict
 from copy import copy
+from operator import itemgetter
+import hashlib
+import heapq
 
 import networkx as nx
 import numpy as np
 
+from .cache import LRUCache
+
+if TYPE_CHECKING:
+    from .search import ParetoFront
+
 
 class Airport:
     def __init__(
@@ -108,72 +116,363 @@ class Airline:
         return hash(self._codename)
 
 
-class Flight:
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_minutes(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(minutes=1)
+
+
+def from_minutes(minutes: int) -> datetime:
+    return EPOCH + timedelta(minutes=int(minutes))
+
+
+class RouteIndex:
+    '''
+    Flight ids grouped by route (airport, neighbor) and sorted by time within every route, routes of an airport
+    are consecutive. Keys combine the route number with the time, so a single binary search over the keys
+    finds a moment on any route, and many of them can be searched for at once.
+    '''
+
+    ROUTE_SHIFT = 32
+
+    def __init__(self, airports_count: int, airport: np.ndarray, neighbor: np.ndarray, time: np.ndarray) -> None:
+        order = np.lexsort((time, neighbor, airport))
+        airport, neighbor = airport[order], neighbor[order]
+
+        starts = np.flatnonzero(np.r_[len(order) > 0, (np.diff(airport) != 0) | (np.diff(neighbor) != 0)])
+
+        self.ids = order
+        self.bounds = np.r_[starts, len(order)]
+        self.neighbors = neighbor[starts]
+        self.airport_routes = np.searchsorted(airport[starts], np.arange(airports_count + 1))
+
+        routes = np.repeat(np.arange(len(starts), dtype=np.int64), np.diff(self.bounds))
+        self.keys = (routes << self.ROUTE_SHIFT) + time[order]
+
+    def routes(self, airport_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # routes of every airport are the range [first, last)
+        return self.airport_routes[airport_ids], self.airport_routes[np.asarray(airport_ids) + 1]
+
+    def search(self, routes: np.ndarray, times: np.ndarray, side: str = 'left') -> np.ndarray:
+        # positions of the given times on the given routes, as in np.searchsorted
+        return np.searchsorted(self.keys, (np.asarray(routes, dtype=np.int64) << self.ROUTE_SHIFT) + times, side=side)
+
+
+class TargetBounds(NamedTuple):
+    # per airport lower bounds of reaching the target, indexed by the airport id
+    flights: List[float]
+    price: List[float]
+    time: List[float]
+
+
+class FlightTable:
+    '''
+    Columnar storage of flights. Airports and airlines are kept once in lookup lists
+    and every flight is a row in a set of contiguous arrays, where departure and arrival
+    are expressed in minutes since the epoch. Rows are ordered by departure, the row
+    number is the id of the flight.
+    '''
+
+    # derived structures, built on first use
+    _INDEXES = (
+        '_outgoing_offsets', '_outgoing_ids', '_outgoing_departure', '_incoming_offsets', '_incoming_ids', '_incoming_arrival',
+        '_routes_by_departure', '_routes_by_arrival', '_digest', '_routes', '_target_bounds'
+    )
+
     def __init__(
         self,
-        origin: Airport,
-        destination: Airport,
-        airline: Airline,
-        departure: datetime,
-        arrival: datetime,
-        price: float,
-        miles: int = None,
+        airlines: List[Airline],
+        airports: List[Airport],
+        origin: np.ndarray,
+        destination: np.ndarray,
+        airline: np.ndarray,
+        departure: np.ndarray,
+        arrival: np.ndarray,
+        price: np.ndarray,
+        miles: np.ndarray,
+        presorted: bool = False
     ) -> None:
-        
-        self._origin: Airport = origin
-        self._destination: Airport = destination
 
-        self._airline = airline
+        self._airlines = list(airlines)
+        self._airports = list(airports)
+
+        self._airport_ids: Dict[Airport, int] = {airport: i for i, airport in enumerate(self._airports)}
+        self._airline_ids: Dict[Airline, int] = {airline: i for i, airline in enumerate(self._airlines)}
+
+        # presorted columns (e.g. memory-mapped ones written by this class) are used as they are, without copying
+        if presorted:
+            self.origin, self.destination, self.airline = origin, destination, airline
+            self.departure, self.arrival = departure, arrival
+            self.price, self.miles = price, miles
+
+        else:
+            departure = np.asarray(departure, dtype=np.int64)
+            arrival = np.asarray(arrival, dtype=np.int64)
+
+            if np.any(departure > arrival):
+                raise ValueError('departure cannot happen after the arrival')
+
+            order = np.argsort(departure, kind='stable')
 
-        if departure > arrival:
-            raise ValueError('departure cannot happen after the arrival')
+            self.origin = np.ascontiguousarray(np.asarray(origin, dtype=np.int32)[order])
+            self.destination = np.ascontiguousarray(np.asarray(destination, dtype=np.int32)[order])
+            self.airline = np.ascontiguousarray(np.asarray(airline, dtype=np.int16)[order])
+            self.departure = np.ascontiguousarray(departure[order])
+            self.arrival = np.ascontiguousarray(arrival[order])
+            self.price = np.ascontiguousarray(np.asarray(price, dtype=np.float64)[order])
+            self.miles = np.ascontiguousarray(np.asarray(miles, dtype=np.int32)[order])
 
-        self._departure: datetime = departure
-        self._arrival: datetime = arrival
-        
-        self._price: float = price
+        self._outgoing_offsets: Optional[np.ndarray] = None
+        self._outgoing_ids: Optional[np.ndarray] = None
+        self._outgoing_departure: Optional[np.ndarray] = None
 
-        self._miles: int = miles
+        self._incoming_offsets: Optional[np.ndarray] = None
+        self._incoming_ids: Optional[np.ndarray] = None
+        self._incoming_arrival: Optional[np.ndarray] = None
+
+        self._routes_by_departure: Optional[RouteIndex] = None
+        self._routes_by_arrival: Optional[RouteIndex] = None
+
+        self._digest: Optional[str] = None
+
+        self._routes: Optional[List[List[Tuple[int, float, int]]]] = None
+        self._target_bounds: Optional[Dict[int, TargetBounds]] = None
+
+    def __len__(self) -> int:
+        return self.departure.shape[0]
+
+    @property
+    def airlines(self) -> List[Airline]:
+        return self._airlines
+
+    @property
+    def airports(self) -> List[Airport]:
+        return self._airports
+
+    @property
+    def transfer_minutes(self) -> np.ndarray:
+        return np.array([
+            airport.transfer_time // timedelta(minutes=1)
+            for airport in self._airports
+        ], dtype=np.int64)
+
+    def airport_id(self, airport: Airport) -> int:
+        return self._airport_ids[airport]
+
+    def airline_id(self, airline: Airline) -> int:
+        return self._airline_ids[airline]
+
+    def _build_outgoing_index(self) -> None:
+        # rows are already ordered by departure, so a stable sort by origin keeps
+        # the flights of every airport sorted by departure as well
+        order = np.argsort(self.origin, kind='stable')
+
+        self._outgoing_offsets = np.searchsorted(self.origin[order], np.arange(len(self._airports) + 1))
+        self._outgoing_ids = order.astype(np.int32)
+        self._outgoing_departure = self.departure[order]
+
+    def outgoing(self, airport_id: int, after: Optional[int] = None, before: Optional[int] = None) -> np.ndarray:
+        '''
+        Ids of the flights leaving the given airport, sorted by departure. If `after` or `before` are given
+        (in minutes since the epoch) only the flights departing within these bounds (inclusive) are returned.
+        '''
+        if self._outgoing_offsets is None:
+            self._build_outgoing_index()
+
+        start, end = self._outgoing_offsets[airport_id], self._outgoing_offsets[airport_id + 1]
+        departures = self._outgoing_departure[start:end]
+
+        if before is not None:
+            end = start + np.searchsorted(departures, before, side='right')
+
+        if after is not None:
+            start += np.searchsorted(departures, after)
+
+        return self._outgoing_ids[start:end]
+
+    def _build_incoming_index(self) -> None:
+        order = np.lexsort((self.arrival, self.destination))
+
+        self._incoming_offsets = np.searchsorted(self.destination[order], np.arange(len(self._airports) + 1))
+        self._incoming_ids = order.astype(np.int32)
+        self._incoming_arrival = self.arrival[order]
+
+    def incoming(self, airport_id: int, after: Optional[int] = None, before: Optional[int] = None) -> np.ndarray:
+        '''
+        Ids of the flights arriving at the given airport, sorted by arrival. If `after` or `before` are given
+        (in minutes since the epoch) only the flights arriving within these bounds (inclusive) are returned.
+        '''
+        if self._incoming_offsets is None:
+            self._build_incoming_index()
+
+        start, end = self._incoming_offsets[airport_id], self._incoming_offsets[airport_id + 1]
+        arrivals = self._incoming_arrival[start:end]
+
+        if before is not None:
+            end = start + np.searchsorted(arrivals, before, side='right')
+
+        if after is not None:
+            start += np.searchsorted(arrivals, after)
+
+        return self._incoming_ids[start:end]
+
+    @property
+    def routes_by_departure(self) -> RouteIndex:
+        # flights leaving the airports, grouped by destination
+        if self._routes_by_departure is None:
+            self._routes_by_departure = RouteIndex(len(self._airports), self.origin, self.destination, self.departure)
+
+        return self._routes_by_departure
+
+    @property
+    def routes_by_arrival(self) -> RouteIndex:
+        # flights arriving at the airports, grouped by origin
+        if self._routes_by_arrival is None:
+            self._routes_by_arrival = RouteIndex(len(self._airports), self.destination, self.origin, self.arrival)
+
+        return self._routes_by_arrival
+
+    def _build_routes(self) -> None:
+        # the cheapest price and the shortest flight time of every route, grouped by the destination of the route
+        keys = self.destination.astype(np.int64) * len(self._airports) + self.origin
+        order = np.argsort(keys, kind='stable')
+        keys = keys[order]
+
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        prices = np.minimum.reduceat(self.price[order], starts)
+        times = np.minimum.reduceat((self.arrival - self.departure)[order], starts)
+
+        self._routes = [[] for _ in self._airports]
+        for key, price, time in zip(keys[starts].tolist(), prices.tolist(), times.tolist()):
+            destination, origin = divmod(key, len(self._airports))
+            self._routes[destination].append((origin, price, time))
+
+    def target_bounds(self, target_id: int) -> TargetBounds:
+        '''
+        Lower bounds of the number of flights, the price and the flight time needed to reach the target from every airport,
+        infinite for the airports from which the target cannot be reached. Computed on the routes of the whole table,
+        so they hold for any time window.
+        '''
+        if self._target_bounds is None:
+            self._target_bounds = {}
+
+        if target_id not in self._target_bounds:
+            if self._routes is None:
+                self._build_routes()
+
+            self._target_bounds[target_id] = TargetBounds(*(
+                self._reverse_distances(target_id, weight) for weight in (lambda route: 1, itemgetter(1), itemgetter(2))
+            ))
+
+        return self._target_bounds[target_id]
+
+    def _reverse_distances(self, target_id: int, weight) -> List[float]:
+        distances = [float('inf')] * len(self._airports)
+        distances[target_id] = 0
+        queue = [(0, target_id)]
+
+        while queue:
+            distance, airport = heapq.heappop(queue)
+            if distance > distances[airport]:
+                continue
+
+            for route in self._routes[airport]:
+                other = distance + weight(route)
+                if other < distances[route[0]]:
+                    distances[route[0]] = other
+                    heapq.heappush(queue, (other, route[0]))
+
+        return distances
+
+    @property
+    def digest(self) -> str:
+        # content hash of the table, identifies it across processes and runs
+        if self._digest is None:
+            digest = hashlib.sha1()
+            digest.update('\n'.join(airport.codename for airport in self._airports).encode())
+            digest.update('\n'.join(airline.codename for airline in self._airlines).encode())
+
+            for column in (self.origin, self.destination, self.airline, self.departure, self.arrival, self.price, self.miles):
+                digest.update(np.ascontiguousarray(column).data)
+
+            self._digest = digest.hexdigest()
+
+        return self._digest
+
+    def flight(self, id: int) -> Flight:
+        return Flight(self, int(id))
+
+    def drop_indexes(self) -> None:
+        for attribute in self._INDEXES:
+            setattr(self, attribute, None)
+
+    def __getstate__(self) -> dict:
+        # indexes are rebuilt on demand, there is no point in storing them
+        return {key: value for key, value in self.__dict__.items() if key not in self._INDEXES}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.drop_indexes()
+
+
+class Flight:
+    '''
+    Lightweight view over a single row of a FlightTable.
+    '''
+
+    __slots__ = ('_table', '_id')
+
+    def __init__(self, table: FlightTable, id: int) -> None:
+        self._table = table
+        self._id = id
+
+    @property
+    def id(self) -> int:
+        return self._id
 
     @property
     def origin(self) -> Airport:
-        return self._origin
+        return self._table.airports[self._table.origin[self._id]]
 
     @property
     def destination(self) -> Airport:
-        return self._destination
+        return self._table.airports[self._table.destination[self._id]]
 
     @property
     def airline(self) -> Airline:
-        return self._airline
+        return self._table.airlines[self._table.airline[self._id]]
 
     @property
     def departure(self) -> datetime:
-        return self._departure
+        return from_minutes(self._table.departure[self._id])
 
     @property
     def arrival(self) -> datetime:
-        return self._arrival
+        return from_minutes(self._table.arrival[self._id])
 
     @property
     def time(self) -> timedelta:
-        return self._arrival - self._departure
+        return timedelta(minutes=int(self._table.arrival[self._id] - self._table.departure[self._id]))
 
     @property
     def price(self) -> float:
-        return self._price
+        return float(self._table.price[self._id])
 
     @property
     def miles(self) -> int:
-        return self._miles
+        return int(self._table.miles[self._id])
 
     @property
     def kilometers(self) -> int:
-        return int(self._miles * 1.60934)
+        return int(self.miles * 1.60934)
 
     def __eq__(self, __o: object) -> bool:
         if not isinstance(__o, Flight):
             return False
+
+        if self._table is __o._table:
+            return self._id == __o._id
             
         return self.origin      == __o.origin \
            and self.destination == __o.destination \
@@ -182,34 +481,48 @@ class Flight:
            and self.arrival     == __o.arrival \
            and self.price       == __o.price
 
+    def __hash__(self) -> int:
+        return hash((self.origin, self.departure))
+
 
 class Network:
+    '''
+    Window over the flights of a FlightTable departing and arriving between the start and the end date.
+    The window is a range of rows of the departure-sorted table, so networks which differ only by dates
+    share the flights storage and its indexes.
+    '''
+
+    # bounds of the cache of the windows handed out by filter_by_date
+    WINDOW_CACHE_ENTRIES = 16
+    WINDOW_CACHE_BYTES = 512 * 2 ** 20
+
     def __init__(
         self,
         start_date: datetime,
         end_date: datetime,
-        airlines: List[Airline],
-        airports: List[Airport],
-        flights: List[Flight]
+        table: FlightTable
     ) -> None:
 
         self._start_date = start_date
         self._end_date = end_date
 
-        self._airlines = airlines
-        self._airports = airports
-        self._flights = flights
+        self._table = table
+        self._transfer_minutes = table.transfer_minutes.tolist()
+
+        self._start_minute = to_minutes(start_date)
+        self._end_minute = to_minutes(end_date)
 
-        self._graph = nx.MultiDiGraph()
+        # flights in the range can still arrive after the end date, these are skipped when accessed
+        self._first_id = int(np.searchsorted(table.departure, self._start_minute))
+        self._last_id = int(np.searchsorted(table.departure, self._end_minute, side='right'))
 
-        self._graph.add_nodes_from(self._airports)
-        self._graph.add_edges_from([
-            (flight.origin, flight.destination, {'obj': flight})
-            for flight in self._flights
-        ])
+        self._graph: Optional[nx.MultiDiGraph] = None
+        self._ant_graph: Optional[nx.MultiGraph] = None
 
-        self.ant_graph = nx.MultiGraph()
-        self._prepare_ant_graph()
+        self._windows = self._window_cache()
+
+    def _window_cache(self) -> LRUCache:
+        return LRUCache(self.WINDOW_CACHE_ENTRIES, self.WINDOW_CACHE_BYTES, Network.estimated_bytes)
 
     @property
     def start_date(self) -> datetime:
@@ -219,30 +532,132 @@ class Network:
     def end_date(self) -> datetime:
         return self._end_date
 
+    @property
+    def start_minute(self) -> int:
+        return self._start_minute
+
+    @property
+    def end_minute(self) -> int:
+        return self._end_minute
+
+    @property
+    def table(self) -> FlightTable:
+        return self._table
+
+    @property
+    def transfer_minutes(self) -> List[int]:
+        return self._transfer_minutes
+
+    @property
+    def version(self) -> str:
+        # networks with the same version hold the same flights, so results computed on one are valid on the other
+        return f'{self._table.digest}:{self._start_minute}:{self._end_minute}'
+
     @property
     def airports(self) -> List[Airport]:
-        return copy(self._airports)
+        return copy(self._table.airports)
+
+    @property
+    def flight_ids(self) -> np.ndarray:
+        ids = np.arange(self._first_id, self._last_id)
+        return ids[self._table.arrival[self._first_id:self._last_id] <= self._end_minute]
 
     @property
     def flights(self) -> List[Flight]:
-        return copy(self._flights)
+        return [self._table.flight(i) for i in self.flight_ids]
 
     @property
     def airlines(self) -> List[Airline]:
-        return copy(self._airlines)
+        return copy(self._table.airlines)
 
     @property
     def graph(self) -> nx.MultiDiGraph:
+        if self._graph is None:
+            ids = self.flight_ids
+            airports = self._table.airports
+
+            # edges are keyed by the flight id, flight itself can be obtained from the table
+            self._graph = nx.MultiDiGraph()
+            self._graph.add_nodes_from(airports)
+            self._graph.add_edges_from(zip(
+                map(airports.__getitem__, self._table.origin[ids]),
+                map(airports.__getitem__, self._table.destination[ids]),
+                ids.tolist()
+            ))
+
         return self._graph
 
+    @property
+    def ant_graph(self) -> nx.MultiGraph:
+        if self._ant_graph is None:
+            self._ant_graph = nx.MultiGraph()
+            self._prepare_ant_graph()
+
+        return self._ant_graph
+
+    def drop_graphs(self) -> None:
+        self._graph = None
+        self._ant_graph = None
+
+    def __getstate__(self) -> dict:
+        # graphs and windows are derived from the table and built again on first use
+        return {key: value for key, value in self.__dict__.items() if key not in ('_graph', '_ant_graph', '_windows')}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.drop_graphs()
+        self._windows = self._window_cache()
+
+    def departures_range(self, after: Optional[int] = None, before: Optional[int] = None) -> Tuple[int, int]:
+        '''
+        Range of ids of the flights departing within the window and within the given bounds (in minutes since the epoch).
+        '''
+        start, end = self._first_id, self._last_id
+
+        if after is not None and after > self._start_minute:
+            start = max(start, int(np.searchsorted(self._table.departure, after)))
+
+        if before is not None and before < self._end_minute:
+            end = min(end, int(np.searchsorted(self._table.departure, before, side='right')))
+
+        return start, end
+
+    def outgoing(self, airport_id: int, after: Optional[int] = None) -> np.ndarray:
+        after = self._start_minute if after is None else max(after, self._start_minute)
+        return self._table.outgoing(airport_id, after, self._end_minute)
+
+    def incoming(self, airport_id: int, before: Optional[int] = None) -> np.ndarray:
+        # flights of the window arriving at the airport not later than `before`, sorted by arrival
+        before = self._end_minute if before is None else min(before, self._end_minute)
+        ids = self._table.incoming(airport_id, self._start_minute, before)
+        return ids[self._table.departure[ids] >= self._start_minute]
+
+    @property
+    def window_cache(self) -> LRUCache:
+        return self._windows
+
+    def estimated_bytes(self) -> int:
+        # the table is shared by all the windows, only the structures built for this one are counted
+        size = 1024 + 8 * len(self._transfer_minutes)
+
+        if self._graph is not None:
+            size += 400 * self._graph.number_of_edges()
+        if self._ant_graph is not None:
+            size += 1500 * self._ant_graph.number_of_edges()
+
+        return size
+
     def filter_by_date(self, from_date: datetime, to_date: datetime) -> Network:
-        flights = [
-            flight
-            for flight in self._flights
-            if from_date <= flight.departure and flight.arrival <= to_date
-        ]
+        # repeated windows get the same network, together with the graphs already built on it
+        key = max(from_date, self.start_date), min(to_date, self.end_date)
 
-        return Network(max(from_date, self.start_date), min(to_date, self.end_date), self._airlines, self._airports, flights)
+        network = self._windows.get(key)
+        if network is None:
+            network = Network(*key, self._table)
+
+        # put again on a hit as well, its graphs might have been built in the meantime
+        self._windows.put(key, network)
+        return network
 
     def random_dfs_search(
         self,
@@ -250,60 +665,233 @@ class Network:
         target: Airport,
         time_offset: datetime = datetime(1970, 1, 1),
         max_depth: int = float('inf'),
-        max_cost: float = float('inf')
+        max_cost: float = float('inf'),
+        rng: Optional[np.random.Generator] = None,
+        max_score: float = float('inf'),
+        time_priority: float = 0,
+        journey_start: Optional[datetime] = None
     ) -> Optional[List[Flight]]:
-
+        '''
+        Random depth first search for a path from the source to the target, leaving not before `time_offset`.
+        Branches which cannot reach the target within `max_depth` flights and `max_cost` are pruned, and so are
+        the ones whose score (price and minutes since `journey_start` or the first departure, weighted by
+        `time_priority`) cannot get below `max_score`.
+        '''
         if source == target:
             return []
 
-        # default value is 9999th year, so that each entrance will have a better time
-        visited: Dict[Airport, datetime] = defaultdict(lambda: datetime(9999, 12, 31))
-        parent: Dict[Airport, Flight] = dict()
-        stack = [(source, time_offset, 0, 0)]  # Airport, time offset, depth, cost
+        permutation = np.random.permutation if rng is None else rng.permutation
 
-        def aggregate_path():
-            if target not in parent:
-                return None
+        table = self._table
+        transfer = self._transfer_minutes
+        end_minute = self._end_minute
+        source_id, target_id = table.airport_id(source), table.airport_id(target)
 
-            path = []
-            current = target
-            while current != source:
-                flight = parent[current]
+        flights_bound, price_bound, time_bound = table.target_bounds(target_id)
+        if flights_bound[source_id] > max_depth or price_bound[source_id] > max_cost:
+            return None
+
+        # default value is the largest possible time, so that each entrance will have a better time
+        visited: Dict[int, int] = defaultdict(lambda: np.iinfo(np.int64).max)
+        start = None if journey_start is None else to_minutes(journey_start)
+        # airport id, time offset, depth, cost, journey start and the path as a (flight id, parent) chain, the path
+        # is kept with the entry, as the airports on it can be entered again later with a different path
+        stack = [(source_id, to_minutes(time_offset), 0, 0, start, None)]
 
-                path.append(flight)
-                current = flight.origin
+        def aggregate_path(chain):
+            path = []
+            while chain is not None:
+                path.append(table.flight(chain[0]))
+                chain = chain[1]
 
             return path[::-1]
 
         while stack:
 
-            airport, offset, depth, cost = stack.pop()
-            offset += airport.transfer_time
+            airport, offset, depth, cost, start, chain = stack.pop()
+            offset += transfer[airport]
+
+            if depth + 1 > max_depth:
+                continue
 
-            for u, v, k in np.random.permutation(list(self._graph.out_edges(airport, keys=True))):
-                flight: Flight = self._graph.edges[u, v, k]['obj']
+            # only the flights departing after the offset are sampled
+            candidates = permutation(self.outgoing(airport, offset))
 
-                if flight.departure < offset \
-                        or cost + flight.price > max_cost \
-                        or depth + 1 > max_depth:
+            for flight_id, v, departure, arrival, price in zip(
+                candidates.tolist(),
+                table.destination[candidates].tolist(),
+                table.departure[candidates].tolist(),
+                table.arrival[candidates].tolist(),
+                table.price[candidates].tolist()
+            ):
+                if cost + price > max_cost or arrival > end_minute:
+                    continue
 
+                if visited[v] <= arrival:
                     continue
 
-                if visited[v] <= flight.arrival:
+                # lower bounds of any path to the target through this flight
+                if depth + 1 + flights_bound[v] > max_depth or cost + price + price_bound[v] > max_cost:
                     continue
 
-                visited[v] = flight.arrival
-                parent[v] = flight
-                stack.append((v, flight.arrival, depth + 1, cost + flight.price))
+                first = departure if start is None else start
+                if max_score < float('inf'):
+                    remaining = 0 if v == target_id else transfer[v] + time_bound[v]
+                    score = (cost + price + price_bound[v]) * (1 - time_priority) + (arrival + remaining - first) * time_priority
+                    if score >= max_score:
+                        continue
 
-                if v == target:
-                    return aggregate_path()
+                visited[v] = arrival
+                if v == target_id:
+                    return aggregate_path((flight_id, chain))
+
+                stack.append((v, arrival, depth + 1, cost + price, first, (flight_id, chain)))
 
         return None
 
+    def random_bidirectional_search(
+        self,
+        source: Airport,
+        target: Airport,
+        time_offset: datetime = datetime(1970, 1, 1),
+        max_depth: int = float('inf'),
+        max_cost: float = float('inf'),
+        rng: Optional[np.random.Generator] = None
+    ) -> Optional[List[Flight]]:
+        '''
+        Randomized search growing two depth first trees in turns, one from the source along the departures and one
+        from the target backwards along the arrivals. The first flight of either tree reaching an airport of the other
+        one, where the transfer time fits and the joined path keeps within `max_depth` and `max_cost`, gives the path.
+        '''
+        if source == target:
+            return []
+
+        permutation = np.random.permutation if rng is None else rng.permutation
+
+        table = self._table
+        transfer = self._transfer_minutes
+        end_minute = self._end_minute
+        source_id, target_id = table.airport_id(source), table.airport_id(target)
+        offset = to_minutes(time_offset)
+
+        flights_bound, price_bound, _ = table.target_bounds(target_id)
+        if flights_bound[source_id] > max_depth or price_bound[source_id] > max_cost:
+            return None
+
+        # labels are (time, depth, cost, flight id, parent label), forward ones hold the arrival at the airport
+        # and backward ones the departure from it, the backward root departs from the target at the end of the window
+        forward: Dict[int, tuple] = {source_id: (offset, 0, 0, None, None)}
+        backward: Dict[int, tuple] = {target_id: (end_minute + transfer[target_id], 0, 0, None, None)}
+        forward_stack = [(source_id, forward[source_id])]
+        backward_stack = [(target_id, backward[target_id])]
+
+        def joins(airport, forward_label, backward_label):
+            return forward_label[0] + transfer[airport] <= backward_label[0] \
+                and forward_label[1] + backward_label[1] <= max_depth \
+                and forward_label[2] + backward_label[2] <= max_cost
+
+        def aggregate_path(forward_label, backward_label):
+            path = []
+            while forward_label[3] is not None:
+                path.append(table.flight(forward_label[3]))
+                forward_label = forward_label[4]
+            path.reverse()
+
+            while backward_label[3] is not None:
+                path.append(table.flight(backward_label[3]))
+                backward_label = backward_label[4]
+
+            return path
+
+        while forward_stack or backward_stack:
+
+            if forward_stack:
+                airport, label = forward_stack.pop()
+                candidates = permutation(self.outgoing(airport, label[0] + transfer[airport]))
+
+                for flight_id, v, arrival, price in zip(
+                    candidates.tolist(),
+                    table.destination[candidates].tolist(),
+                    table.arrival[candidates].tolist(),
+                    table.price[candidates].tolist()
+                ):
+                    depth, cost = label[1] + 1, label[2] + price
+                    if arrival > end_minute or depth + flights_bound[v] > max_depth or cost + price_bound[v] > max_cost:
+                        continue
+
+                    new_label = (arrival, depth, cost, flight_id, label)
+                    if v in backward and joins(v, new_label, backward[v]):
+                        return aggregate_path(new_label, backward[v])
+
+                    if v in forward and forward[v][0] <= arrival:
+                        continue
+
+                    forward[v] = new_label
+                    forward_stack.append((v, new_label))
+
+            if backward_stack:
+                airport, label = backward_stack.pop()
+                candidates = permutation(self.incoming(airport, label[0] - transfer[airport]))
+
+                for flight_id, u, departure, price in zip(
+                    candidates.tolist(),
+                    table.origin[candidates].tolist(),
+                    table.departure[candidates].tolist(),
+                    table.price[candidates].tolist()
+                ):
+                    # at least one more flight is needed to get there from the source
+                    depth, cost = label[1] + 1, label[2] + price
+                    if departure < offset or depth + (u != source_id) > max_depth or cost > max_cost:
+                        continue
+
+                    new_label = (departure, depth, cost, flight_id, label)
+                    if u in forward and joins(u, forward[u], new_label):
+                        return aggregate_path(forward[u], new_label)
+
+                    if u in backward and backward[u][0] >= departure:
+                        continue
+
+                    backward[u] = new_label
+                    backward_stack.append((u, new_label))
+
+        return None
+
+    def earliest_arrival(
+        self,
+        source: Airport,
+        target: Airport,
+        depart_after: datetime = datetime(1970, 1, 1),
+        max_transfers: int = float('inf'),
+        max_cost: float = float('inf')
+    ) -> Optional[List[Flight]]:
+
+        from .search import earliest_arrival
+        return earliest_arrival(self, source, target, depart_after, max_transfers, max_cost)
+
+    def pareto_front(
+        self,
+        source: Airport,
+        target: Airport,
+        from_date: datetime,
+        to_date: datetime,
+        max_transfers: int = float('inf'),
+        max_cost: float = float('inf'),
+        deadline: Optional[float] = None
+    ) -> ParetoFront:
+
+        from .search import pareto_profile
+        return pareto_profile(self, source, target, from_date, to_date, max_transfers, max_cost, deadline)
+
     def _prepare_ant_graph(self):
-        for flight in self.flights:
-            self.ant_graph.add_edge(flight.origin, flight.destination, origin=flight.origin,
-                                    destination=flight.destination, departure_time=flight.departure,
-                                    arrival_time=flight.arrival, flight_time=flight.time, price=flight.price,
-                                    pheromone_level=0, pheromone_update_time=0, flight=flight)
+        self._ant_graph.add_nodes_from(self._table.airports)
+        self._ant_graph.add_edges_from(
+            (flight.origin, flight.destination, {
+                'origin': flight.origin,
+                'destination': flight.destination,
+                'departure_time': flight.departure,
+                'arrival_time': flight.arrival,
+                'price': flight.price,
+                'flight': flight
+            })
+            for flight in map(self._table.flight, self.flight_ids)
+        )
@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+from typing import Optional, List
+import time
+
+from .data import Flight
+
+
+@dataclass
+class Progress:
+    # best path found so far and its cost, as defined by the algorithm
+    path: Optional[List[Flight]]
+    cost: float
+
+    # iterations (or events) done out of the planned ones and the time elapsed since the start, in seconds
+    iteration: int
+    iterations: int
+    elapsed: float
+
+    # the last report of a run, its path is the result of the run
+    finished: bool = False
+
+
+class StopCondition:
+    '''
+    Wall-clock budget (in seconds) and patience (in iterations without an improvement of the best cost) of a run.
+    '''
+
+    def __init__(self, time_budget: Optional[float] = None, patience: Optional[int] = None) -> None:
+        self._time_budget = time_budget
+        self._patience = patience
+
+        self._start = time.monotonic()
+        self._best_cost = float('inf')
+        self._last_improvement = 0
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self._start
+
+    def update(self, iteration: int, cost: float) -> None:
+        if cost < self._best_cost:
+            self._best_cost = cost
+            self._last_improvement = iteration
+
+    def expired(self) -> bool:
+        return self._time_budget is not None and self.elapsed >= self._time_budget
+
+    def should_stop(self, iteration: int) -> bool:
+        if self.expired():
+            return True
+
+        return self._patience is not None and iteration - self._last_improvement >= self._patience
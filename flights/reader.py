@@ -1,38 +1,61 @@
-from datetime import datetime, date, time, timedelta
-from typing import Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, List, Tuple
 from pathlib import Path
+import hashlib
+import io
+import json
+import os
+import shutil
 
 import scipy.stats as st
 import pandas as pd
 import numpy as np
 import pickle
 
-from .data import Network, Airline, Airport, Flight
+from .data import Network, Airline, Airport, FlightTable
+from .storage import FORMAT_VERSION, read_network, write_network
 
 
 class Reader:
     FLIGHTS_COLS = ['YEAR', 'MONTH', 'DAY', 'AIRLINE', 'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT', 'SCHEDULED_DEPARTURE', 'DISTANCE', 'SCHEDULED_TIME', 'SCHEDULED_ARRIVAL']
+    FLIGHTS_DTYPES = {
+        'YEAR': np.int16,
+        'MONTH': np.int8,
+        'DAY': np.int8,
+        'AIRLINE': str,
+        'ORIGIN_AIRPORT': str,  # some of the months use numeric codes, these are filtered out
+        'DESTINATION_AIRPORT': str,
+        'SCHEDULED_DEPARTURE': np.int16,
+        'DISTANCE': np.int32,
+        'SCHEDULED_TIME': np.float32,  # the only column with missing values
+        'SCHEDULED_ARRIVAL': np.int16
+    }
+    CHUNKSIZE = 500_000
+    RANGES_PER_WORKER = 4
 
     @staticmethod
-    def random_price(size: int):
+    def random_price(size: int, rng: Optional[np.random.Generator] = None):
+        rng = np.random.default_rng() if rng is None else rng
+
         lowcost_count = int((1 / 11.7) * size)
         normalcost_count = int((10 / 11.7) * size)
         highcost_count = size - lowcost_count - normalcost_count
 
         values = np.concatenate([
-            st.norm.ppf(np.random.random(size=lowcost_count),    loc=0.1, scale=0.04),
-            st.norm.ppf(np.random.random(size=normalcost_count), loc=0.3, scale=0.15),
-            st.norm.ppf(np.random.random(size=highcost_count),   loc=0.8, scale=0.1)
+            st.norm.ppf(rng.random(size=lowcost_count),    loc=0.1, scale=0.04),
+            st.norm.ppf(rng.random(size=normalcost_count), loc=0.3, scale=0.15),
+            st.norm.ppf(rng.random(size=highcost_count),   loc=0.8, scale=0.1)
         ])
 
         return np.maximum(0, values)
 
     @staticmethod
-    def _generate_price(dists: np.ndarray):
+    def _generate_price(dists: np.ndarray, rng: np.random.Generator):
         return np.maximum(
             0,
             np.round(
-                Reader.random_price(dists.shape[0]) * dists + np.random.normal(30, 15, size=dists.shape[0]),
+                Reader.random_price(dists.shape[0], rng) * dists + rng.normal(30, 15, size=dists.shape[0]),
                 2
             )
         )
@@ -40,15 +63,8 @@ class Reader:
     # TODO would be great to get the real numbers of terminals
     # I searched for 15 minutes and couldn't find anything related, should check better resources
     @staticmethod
-    def _generate_terminals(size: int) -> int:
-        return np.maximum(np.random.normal(8, 2.8, size=size), 1).astype(np.int32)
-
-    @staticmethod
-    def _parse_datetime(year: int, month: int, day: int, flight_time: int):
-        date_obj = date(year, month, day)
-        time_obj = time(flight_time // 100, flight_time % 100)
-
-        return datetime.combine(date_obj, time_obj)
+    def _generate_terminals(size: int, rng: np.random.Generator) -> int:
+        return np.maximum(rng.normal(8, 2.8, size=size), 1).astype(np.int32)
 
     @staticmethod
     def _airlines_preprocessing(airlines_df: pd.DataFrame) -> pd.DataFrame:
@@ -56,8 +72,8 @@ class Reader:
         return airlines_df
     
     @staticmethod
-    def _airports_preprocessing(airports_df: pd.DataFrame) -> pd.DataFrame:
-        airports_df['TERMINALS'] = Reader._generate_terminals(airports_df.shape[0])
+    def _airports_preprocessing(airports_df: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+        airports_df['TERMINALS'] = Reader._generate_terminals(airports_df.shape[0], rng)
         return airports_df
 
     @staticmethod
@@ -71,23 +87,29 @@ class Reader:
 
         flights_df = flights_df[Reader.FLIGHTS_COLS].dropna()
 
-        flights_df = flights_df[flights_df['ORIGIN_AIRPORT'].isin(airports)]
-        flights_df = flights_df[flights_df['DESTINATION_AIRPORT'].isin(airports)]
-        flights_df = flights_df[flights_df['AIRLINE'].isin(airlines)]
+        # cheap filtering on the day of the departure, before any datetime is built
+        days = flights_df['YEAR'].to_numpy(np.int32) * 10000 + flights_df['MONTH'].to_numpy(np.int32) * 100 + flights_df['DAY'].to_numpy(np.int32)
+        mask = np.ones(flights_df.shape[0], dtype=bool)
+
+        if from_date is not None:
+            mask &= days >= from_date.year * 10000 + from_date.month * 100 + from_date.day
+        if to_date is not None:
+            mask &= days <= to_date.year * 10000 + to_date.month * 100 + to_date.day
+
+        flights_df = flights_df[mask]
+
+        flights_df = flights_df[flights_df['ORIGIN_AIRPORT'].isin(list(airports))]
+        flights_df = flights_df[flights_df['DESTINATION_AIRPORT'].isin(list(airports))]
+        flights_df = flights_df[flights_df['AIRLINE'].isin(list(airlines))]
 
-        flights_df['PRICE'] = Reader._generate_price(flights_df['DISTANCE'].to_numpy(np.int32))
-        
-        departure_datetimes = [
-            Reader._parse_datetime(row.YEAR, row.MONTH, row.DAY, row.SCHEDULED_DEPARTURE)
-            for row in flights_df.itertuples()
-        ]
-        arrival_datetimes = [
-            departure + timedelta(minutes=scheduled_time)
-            for departure, scheduled_time in zip(departure_datetimes, flights_df['SCHEDULED_TIME'])
-        ]
+        scheduled_departure = flights_df['SCHEDULED_DEPARTURE'].to_numpy(np.int64)
+        departure_datetimes = pd.to_datetime(flights_df[['YEAR', 'MONTH', 'DAY']].rename(columns=str.lower)) \
+            + pd.to_timedelta(scheduled_departure // 100 * 60 + scheduled_departure % 100, unit='min')
 
-        flights_df['DEPARTURE'] = departure_datetimes
-        flights_df['ARRIVAL'] = arrival_datetimes
+        flights_df = flights_df.assign(
+            DEPARTURE=departure_datetimes,
+            ARRIVAL=departure_datetimes + pd.to_timedelta(flights_df['SCHEDULED_TIME'].to_numpy(np.int64), unit='min')
+        )
 
         if from_date is not None:
             flights_df = flights_df[flights_df['DEPARTURE'] >= from_date]
@@ -98,7 +120,131 @@ class Reader:
         return flights_df
 
     @staticmethod
-    def read_flights(data_dir: str, from_date: datetime = None, to_date: datetime = None) -> Network:
+    def _byte_ranges(path: Path, parts: int) -> Tuple[bytes, List[Tuple[int, int]]]:
+        # splits the file (without the header) into ranges which start and end on line boundaries
+        size = path.stat().st_size
+
+        with open(path, 'rb') as f:
+            header = f.readline()
+            boundaries = [f.tell()]
+
+            for part in range(1, parts):
+                f.seek(max(boundaries[-1], part * size // parts))
+                f.readline()
+                boundaries.append(min(f.tell(), size))
+
+        boundaries.append(size)
+
+        return header, [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+    @staticmethod
+    def _read_flights_range(
+        path: Path,
+        header: bytes,
+        start: int,
+        end: int,
+        airlines: Dict[str, Airline],
+        airports: Dict[str, Airport],
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None
+    ) -> pd.DataFrame:
+
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+
+        flights_df = pd.read_csv(io.BytesIO(header + data), usecols=Reader.FLIGHTS_COLS, dtype=Reader.FLIGHTS_DTYPES)
+
+        return Reader._flights_preprocessing(flights_df, airlines, airports, from_date, to_date)
+
+    @staticmethod
+    def _read_flights_csv(
+        path: Path,
+        airlines: Dict[str, Airline],
+        airports: Dict[str, Airport],
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        chunksize: Optional[int] = CHUNKSIZE,
+        rng: Optional[np.random.Generator] = None,
+        workers: Optional[int] = None
+    ) -> pd.DataFrame:
+
+        if workers is not None and workers > 1:
+            # every worker parses and filters byte ranges of the file on its own, a few ranges
+            # per worker keep them busy even if the rows are not spread evenly over the dates
+            header, ranges = Reader._byte_ranges(path, workers * Reader.RANGES_PER_WORKER)
+
+            with ProcessPoolExecutor(workers) as executor:
+                parts = list(executor.map(
+                    Reader._read_flights_range,
+                    *zip(*[
+                        (path, header, start, end, airlines, airports, from_date, to_date)
+                        for start, end in ranges
+                    ])
+                ))
+
+        else:
+            # only the needed columns are parsed, and with chunks the rows outside of the dates
+            # are dropped before the next chunk is read
+            chunks = pd.read_csv(path, usecols=Reader.FLIGHTS_COLS, dtype=Reader.FLIGHTS_DTYPES, chunksize=chunksize)
+            if chunksize is None:
+                chunks = [chunks]
+
+            parts = [
+                Reader._flights_preprocessing(chunk, airlines, airports, from_date, to_date)
+                for chunk in chunks
+            ]
+
+        # rows keep the file order in both cases, so the prices generated for a given seed are the same
+        flights_df = pd.concat(parts, ignore_index=True)
+        flights_df['PRICE'] = Reader._generate_price(flights_df['DISTANCE'].to_numpy(np.int32), rng)
+
+        return flights_df
+
+    @staticmethod
+    def _flights_table(flights_df: pd.DataFrame, airlines: Dict[str, Airline], airports: Dict[str, Airport]) -> FlightTable:
+        airline_ids = {codename: i for i, codename in enumerate(airlines)}
+        airport_ids = {codename: i for i, codename in enumerate(airports)}
+
+        return FlightTable(
+            airlines=list(airlines.values()),
+            airports=list(airports.values()),
+            origin=flights_df['ORIGIN_AIRPORT'].map(airport_ids).to_numpy(np.int32),
+            destination=flights_df['DESTINATION_AIRPORT'].map(airport_ids).to_numpy(np.int32),
+            airline=flights_df['AIRLINE'].map(airline_ids).to_numpy(np.int16),
+            departure=flights_df['DEPARTURE'].to_numpy('datetime64[m]').astype(np.int64),
+            arrival=flights_df['ARRIVAL'].to_numpy('datetime64[m]').astype(np.int64),
+            price=flights_df['PRICE'].to_numpy(np.float64),
+            miles=flights_df['DISTANCE'].to_numpy(np.int32)
+        )
+
+    @staticmethod
+    def _cache_key(data_dir: Path, from_date: datetime, to_date: datetime, seed: Optional[int]) -> str:
+        fingerprint = [FORMAT_VERSION, from_date.isoformat(), to_date.isoformat(), seed]
+
+        for filename in ['airlines.csv', 'airports.csv', 'flights.csv']:
+            stat = (data_dir / filename).stat()
+            fingerprint.append([str(data_dir / filename), stat.st_size, stat.st_mtime_ns])
+
+        return hashlib.sha1(json.dumps(fingerprint).encode()).hexdigest()
+
+    @staticmethod
+    def read_flights(
+        data_dir: str,
+        from_date: datetime = None,
+        to_date: datetime = None,
+        chunksize: Optional[int] = CHUNKSIZE,
+        seed: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        workers: Optional[int] = None
+    ) -> Network:
+        '''
+        Reads and preprocesses the csv files. The `seed` makes generated prices and terminals reproducible.
+        With `cache_dir` the preprocessed network is stored there in the binary format, keyed by the csv files
+        paths, sizes and modification times, the dates and the seed, so that repeated reads skip preprocessing.
+        With more than one of `workers` the flights file is split into byte ranges parsed by a process pool.
+        '''
+
         data_dir = Path(data_dir).resolve()
 
         # FIXME this should be infered by using max and min on the data
@@ -113,9 +259,15 @@ class Reader:
         if any(not (data_dir / filename).exists() for filename in ['airlines.csv', 'airports.csv', 'flights.csv']):
             raise ValueError('either airlines.csv, airports.csv or flights.csv does not exist in the given data directory')
 
+        if cache_dir is not None:
+            cache_path = Path(cache_dir) / Reader._cache_key(data_dir, from_date, to_date, seed)
+            if cache_path.exists():
+                return read_network(cache_path)
+
+        rng = np.random.default_rng(seed)
+
         airlines_df = pd.read_csv(data_dir / 'airlines.csv')
         airports_df = pd.read_csv(data_dir / 'airports.csv')
-        flights_df = pd.read_csv(data_dir / 'flights.csv')
 
         airlines_df = Reader._airlines_preprocessing(airlines_df)
         airlines = {
@@ -123,33 +275,29 @@ class Reader:
             for row in airlines_df.itertuples()
         }
 
-        airports_df = Reader._airports_preprocessing(airports_df)
+        airports_df = Reader._airports_preprocessing(airports_df, rng)
         airports = {
             row.IATA_CODE: Airport(row.IATA_CODE, row.AIRPORT, row.CITY, row.STATE, row.COUNTRY, row.LONGITUDE, row.LATITUDE, terminals=row.TERMINALS)
             for row in airports_df.itertuples()
         }
 
-        flights_df = Reader._flights_preprocessing(flights_df, airlines, airports, from_date, to_date)
-        flights = [
-            Flight(
-                origin=airports[row.ORIGIN_AIRPORT],
-                destination=airports[row.DESTINATION_AIRPORT],
-                airline=airlines[row.AIRLINE],
-                departure=row.DEPARTURE,
-                arrival=row.ARRIVAL,
-                price=row.PRICE,
-                miles=row.DISTANCE
-            )
-            for row in flights_df.itertuples()
-        ]
-
-        return Network(
-            from_date,
-            to_date,
-            list(airlines.values()),
-            list(airports.values()),
-            flights
-        )
+        flights_df = Reader._read_flights_csv(data_dir / 'flights.csv', airlines, airports, from_date, to_date, chunksize, rng, workers)
+        flights = Reader._flights_table(flights_df, airlines, airports)
+
+        network = Network(from_date, to_date, flights)
+
+        if cache_dir is not None:
+            # written aside and renamed, so that concurrent readers never see a partial entry
+            partial_path = cache_path.with_name(f'{cache_path.name}.{os.getpid()}.partial')
+            write_network(network, partial_path)
+
+            try:
+                os.replace(partial_path, cache_path)
+            except OSError:
+                # another process has already stored the same entry
+                shutil.rmtree(partial_path)
+
+        return network
 
     @staticmethod
     def read_network_pickled(pickle_path: str) -> Network:
@@ -159,3 +307,7 @@ class Reader:
         assert type(network) == Network, 'pickled file does not contain a Network class or it is outdated'
 
         return network
+
+    @staticmethod
+    def read_network_binary(directory: str, mmap: bool = True) -> Network:
+        return read_network(directory, mmap)
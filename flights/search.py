@@ -0,0 +1,249 @@
+from typing import Optional, List, Tuple
+from datetime import datetime, timedelta
+import heapq
+import time
+
+import numpy as np
+
+from .data import Network, Airport, Flight, to_minutes
+
+
+# label of a partial journey: (legs, cost, flight id, parent label)
+Label = Tuple[int, float, Optional[int], Optional[tuple]]
+
+SCAN_CHUNK = 4096
+
+
+def _merge_label(labels: List[Label], label: Label) -> None:
+    # labels of an airport form a pareto set, sorted by legs with strictly decreasing cost
+    legs, cost = label[0], label[1]
+
+    for other in labels:
+        if other[0] <= legs and other[1] <= cost:
+            return
+
+    labels[:] = [other for other in labels if not (legs <= other[0] and cost <= other[1])]
+    labels.append(label)
+    labels.sort(key=lambda x: x[0])
+
+
+def _aggregate_path(network: Network, label: Label) -> List[Flight]:
+    path = []
+    while label[2] is not None:
+        path.append(network.table.flight(label[2]))
+        label = label[3]
+
+    return path[::-1]
+
+
+def earliest_arrival(
+    network: Network,
+    source: Airport,
+    target: Airport,
+    depart_after: datetime,
+    max_transfers: int = float('inf'),
+    max_cost: float = float('inf')
+) -> Optional[List[Flight]]:
+    '''
+    Connection scan over the departure-sorted flights of the network. Returns the path with the earliest
+    arrival at the target (cheapest one in case of a tie), which leaves the source not before `depart_after`,
+    takes at most `max_transfers` transfers and costs at most `max_cost`, or None if there is no such path.
+    '''
+    if source == target:
+        return []
+
+    table = network.table
+    transfer = network.transfer_minutes
+    end_minute = network.end_minute
+    source_id, target_id = table.airport_id(source), table.airport_id(target)
+    max_legs = max_transfers + 1
+
+    # labels which can be used to board a flight and the ones still waiting for the transfer
+    active: List[List[Label]] = [[] for _ in table.airports]
+    pending: List[list] = [[] for _ in table.airports]
+    active[source_id].append((0, 0.0, None, None))
+
+    best: Tuple[int, float] = (np.iinfo(np.int64).max, float('inf'))  # arrival, cost
+    best_label: Optional[Label] = None
+    sequence = 0
+
+    start, end = network.departures_range(after=to_minutes(depart_after))
+
+    for chunk_start in range(start, end, SCAN_CHUNK):
+        chunk = slice(chunk_start, min(chunk_start + SCAN_CHUNK, end))
+
+        for flight_id, origin, destination, departure, arrival, price in zip(
+            range(chunk.start, chunk.stop),
+            table.origin[chunk].tolist(),
+            table.destination[chunk].tolist(),
+            table.departure[chunk].tolist(),
+            table.arrival[chunk].tolist(),
+            table.price[chunk].tolist()
+        ):
+            # nothing departing after the best arrival can improve it
+            if departure > best[0]:
+                return _aggregate_path(network, best_label)
+
+            if arrival > end_minute:
+                continue
+
+            waiting = pending[origin]
+            while waiting and waiting[0][0] <= departure:
+                _merge_label(active[origin], heapq.heappop(waiting)[2])
+
+            for parent in active[origin]:
+                legs, cost = parent[0] + 1, parent[1] + price
+                if legs > max_legs or cost > max_cost:
+                    continue
+
+                label = (legs, cost, flight_id, parent)
+
+                if destination == target_id:
+                    if (arrival, cost) < best:
+                        best, best_label = (arrival, cost), label
+                    continue
+
+                heapq.heappush(pending[destination], (arrival + transfer[destination], sequence, label))
+                sequence += 1
+
+    return _aggregate_path(network, best_label) if best_label is not None else None
+
+
+class ParetoFront:
+    '''
+    Pareto optimal paths with respect to the price, duration and the number of transfers.
+    '''
+
+    def __init__(self, paths: List[List[Flight]]) -> None:
+        self._paths = sorted(paths, key=_path_price)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    @property
+    def paths(self) -> List[List[Flight]]:
+        return list(self._paths)
+
+    def best(self, time_priority: float) -> Optional[List[Flight]]:
+        # same scalarization as the one used by the bee colony cost function
+        if not self._paths:
+            return None
+
+        return min(
+            self._paths,
+            key=lambda path: _path_price(path) * (1 - time_priority) + _path_duration(path) * time_priority
+        )
+
+
+def _path_price(path: List[Flight]) -> float:
+    return sum(flight.price for flight in path)
+
+
+def _path_duration(path: List[Flight]) -> int:
+    return (path[-1].arrival - path[0].departure) // timedelta(minutes=1)
+
+
+def _dominates(a: tuple, b: tuple) -> bool:
+    return all(x <= y for x, y in zip(a, b))
+
+
+def _merge_criteria(front: list, criteria: tuple, item) -> bool:
+    # front is a list of (criteria, item) pairs, all criteria are minimized
+    for other, _ in front:
+        if _dominates(other, criteria):
+            return False
+
+    front[:] = [(other, x) for other, x in front if not _dominates(criteria, other)]
+    front.append((criteria, item))
+    return True
+
+
+def pareto_profile(
+    network: Network,
+    source: Airport,
+    target: Airport,
+    from_date: datetime,
+    to_date: datetime,
+    max_transfers: int = float('inf'),
+    max_cost: float = float('inf'),
+    deadline: Optional[float] = None
+) -> ParetoFront:
+    '''
+    Multi-criteria connection scan. Returns all the pareto optimal (price, duration, transfers) paths
+    from the source to the target, which depart not before `from_date` and arrive not after `to_date`.
+    With `deadline`, a time.time() timestamp, the scan raises TimeoutError once it passes.
+    '''
+    if source == target:
+        return ParetoFront([])
+
+    table = network.table
+    transfer = network.transfer_minutes
+    source_id, target_id = table.airport_id(source), table.airport_id(target)
+    max_legs = max_transfers + 1
+    to_minute = min(to_minutes(to_date), network.end_minute)
+
+    # labels at the airports are compared by (-first departure, cost, legs),
+    # the first departure of the source label is the departure of the boarded flight
+    source_label = (None, 0.0, 0, None, None)  # first departure, cost, legs, flight id, parent
+    active: List[list] = [[] for _ in table.airports]
+    pending: List[list] = [[] for _ in table.airports]
+    front: list = []  # (duration, cost, legs), label
+    sequence = 0
+
+    start, end = network.departures_range(to_minutes(from_date), to_minute)
+
+    for chunk_start in range(start, end, SCAN_CHUNK):
+        if deadline is not None and time.time() > deadline:
+            raise TimeoutError('deadline passed during the search')
+
+        chunk = slice(chunk_start, min(chunk_start + SCAN_CHUNK, end))
+
+        for flight_id, origin, destination, departure, arrival, price in zip(
+            range(chunk.start, chunk.stop),
+            table.origin[chunk].tolist(),
+            table.destination[chunk].tolist(),
+            table.departure[chunk].tolist(),
+            table.arrival[chunk].tolist(),
+            table.price[chunk].tolist()
+        ):
+            if arrival > to_minute or destination == source_id:
+                continue
+
+            waiting = pending[origin]
+            while waiting and waiting[0][0] <= departure:
+                label = heapq.heappop(waiting)[2]
+                _merge_criteria(active[origin], (-label[0], label[1], label[2]), label)
+
+            parents = [source_label] if origin == source_id else [label for _, label in active[origin]]
+
+            for parent in parents:
+                first = departure if parent[0] is None else parent[0]
+                cost, legs = parent[1] + price, parent[2] + 1
+                if legs > max_legs or cost > max_cost:
+                    continue
+
+                label = (first, cost, legs, flight_id, parent)
+
+                if destination == target_id:
+                    _merge_criteria(front, (arrival - first, cost, legs), label)
+                    continue
+
+                # any continuation takes longer, costs more and has more flights than that
+                if any(_dominates(other, (arrival - first, cost, legs + 1)) for other, _ in front):
+                    continue
+
+                heapq.heappush(pending[destination], (arrival + transfer[destination], sequence, label))
+                sequence += 1
+
+    paths = []
+    for _, label in front:
+        path = []
+        while label[3] is not None:
+            path.append(table.flight(label[3]))
+            label = label[4]
+        paths.append(path[::-1])
+
+    return ParetoFront(paths)
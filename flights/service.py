@@ -0,0 +1,462 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace, fields
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from typing import Optional, Union, List
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import time
+
+from .data import Network, Flight
+from .batch import load_network, init_worker, worker_network
+from .ants import AntColonyAlgorithm, AntColonyConfiguration
+from .bees import BeeColonyAlgorithm, BeeColonyConfiguration
+
+
+ALGORITHMS = ('ants', 'bees', 'exact')
+
+# options of the exact search and their types, the other algorithms take the fields of their configurations
+EXACT_OPTIONS = {'max_transfers': int, 'max_cost': float, 'time_priority': float}
+
+# configuration fields which are not options, the window is given by the query itself, and a query can neither
+# start processes of its own, beyond the limits of the service, nor pick the seed of the run
+FIXED_FIELDS = {'min_time', 'max_time', 'from_datetime', 'to_datetime', 'workers', 'seed'}
+
+# share of the time left before the deadline given to the anytime algorithms, the rest covers the overhead
+BUDGET_SHARE = 0.8
+
+# seconds a worker may go on past the deadline of its query, after that it is killed and replaced
+GRACE = 5.0
+
+# largest accepted request body, in bytes
+MAX_BODY = 2 ** 20
+
+class ServiceError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _ants_configuration(query: dict) -> AntColonyConfiguration:
+    return AntColonyConfiguration(
+        iters_numb=1000,
+        result_samples=10,
+        ants_number=100,
+        ants_spawn_iters=10,
+        connection_samples=3,
+        direct_connection_impact=0.8,
+        time_impact_nodes=0.6,
+        pheromone_impact=0.4,
+        min_time=query['from'],
+        max_time=query['to'],
+        min_conn_time=90,
+        max_conn_numb=5,
+        max_price=10000,
+        pheromone_updating_time=1000,
+        time_impact_choice=0.5
+    )
+
+
+def _bees_configuration(query: dict) -> BeeColonyConfiguration:
+    return BeeColonyConfiguration(
+        from_datetime=query['from'],
+        to_datetime=query['to'],
+        max_cost=10000,
+        transfer_time=timedelta(minutes=30),
+        max_transfers=5,
+        time_priority=0.5,
+        iterations=100,
+        scout_bees=20,
+        best_sites=10,
+        elite_sites=4,
+        elite_sites_bees=4,
+        rest_sites_bees=2,
+        max_shrinkages=3
+    )
+
+
+def _option_types(algorithm: str) -> dict:
+    if algorithm == 'exact':
+        return EXACT_OPTIONS
+
+    configuration = AntColonyConfiguration if algorithm == 'ants' else BeeColonyConfiguration
+    return {field.name: field.type for field in fields(configuration) if field.name not in FIXED_FIELDS}
+
+
+def check_options(algorithm: str, options: dict) -> None:
+    '''
+    Raises ValueError unless the options are known to the algorithm and their json values fit the types of the options,
+    numbers have to be finite and not negative, transfer_time is given in minutes.
+    '''
+    types = _option_types(algorithm)
+
+    unknown = set(options) - set(types)
+    if unknown:
+        raise ValueError(f'unknown options: {", ".join(sorted(unknown))}')
+
+    for name, value in options.items():
+        kind = types[name]
+
+        if kind is bool:
+            valid = isinstance(value, bool)
+        elif kind is int:
+            valid = isinstance(value, int) and not isinstance(value, bool) and value >= 0
+        else:  # float and timedelta
+            valid = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value) and value >= 0
+
+        if not valid:
+            raise ValueError(f'invalid value of the {name} option: {value!r}')
+
+
+def _configure(configuration, algorithm: str, options: dict):
+    # options override the default configuration
+    check_options(algorithm, options)
+
+    if 'transfer_time' in options:
+        options = {**options, 'transfer_time': timedelta(minutes=options['transfer_time'])}
+
+    return replace(configuration, **options)
+
+
+def _flight_json(flight: Flight) -> dict:
+    return {
+        'origin': flight.origin.codename,
+        'destination': flight.destination.codename,
+        'airline': flight.airline.codename,
+        'departure': flight.departure.isoformat(),
+        'arrival': flight.arrival.isoformat(),
+        'price': round(flight.price, 2)
+    }
+
+
+def _path_json(path: Optional[List[Flight]]) -> dict:
+    if not path:
+        return {'path': None}
+
+    return {
+        'path': [_flight_json(flight) for flight in path],
+        'price': round(sum(flight.price for flight in path), 2),
+        'minutes': (path[-1].arrival - path[0].departure) // timedelta(minutes=1)
+    }
+
+
+def solve(network: Network, query: dict, deadline: Optional[float] = None) -> dict:
+    '''
+    Runs a parsed query (see QueryService.parse) and returns the found path in its json form. The anytime algorithms
+    answer with the best path found by the `deadline`, a time.time() timestamp, the exact search raises TimeoutError.
+    '''
+    airports = {airport.codename: airport for airport in network.airports}
+    origin, destination = airports[query['origin']], airports[query['destination']]
+    options = query['options']
+
+    if query['algorithm'] == 'exact':
+        check_options('exact', options)
+        front = network.filter_by_date(query['from'], query['to']).pareto_front(
+            origin,
+            destination,
+            query['from'],
+            query['to'],
+            options.get('max_transfers', float('inf')),
+            options.get('max_cost', float('inf')),
+            deadline
+        )
+        return _path_json(front.best(options.get('time_priority', 0.5)))
+
+    if query['algorithm'] == 'ants':
+        algorithm = AntColonyAlgorithm(network, _configure(_ants_configuration(query), 'ants', options))
+    else:
+        algorithm = BeeColonyAlgorithm(network, _configure(_bees_configuration(query), 'bees', options))
+
+    time_budget = None if deadline is None else max(deadline - time.time(), 0)
+    for progress in algorithm.iterate(origin, destination, time_budget=time_budget):
+        pass
+
+    return _path_json(progress.path)
+
+
+def _worker_loop(network: Union[Network, str], connection) -> None:
+    # solves the queries sent by the service one after another
+    init_worker(network)
+
+    while True:
+        try:
+            query, deadline = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            answer = 'ok', solve(worker_network(), query, deadline)
+        except Exception as error:
+            answer = 'error', error
+
+        connection.send(answer)
+
+
+class _Worker:
+    '''
+    Process solving one query at a time, owned by the service, so that a worker stuck on a query can be killed alone.
+    '''
+
+    def __init__(self, network: Union[Network, str]) -> None:
+        context = multiprocessing.get_context()
+        self._connection, child = context.Pipe()
+        self._process = context.Process(target=_worker_loop, args=(network, child), daemon=True)
+        self._process.start()
+        child.close()
+
+        self.dead = False
+
+    def solve(self, query: dict, deadline: float) -> dict:
+        # blocks until the answer comes, it is called from a thread
+        self._connection.send((query, deadline))
+
+        try:
+            status, value = self._connection.recv()
+        except (EOFError, OSError):
+            self.dead = True
+            raise ServiceError(HTTPStatus.INTERNAL_SERVER_ERROR, 'worker stopped while solving the query')
+
+        if status == 'error':
+            raise value
+        return value
+
+    def kill(self) -> None:
+        # the pending solve call fails once the process is gone
+        self._process.kill()
+
+    def close(self) -> None:
+        self._process.kill()
+        self._connection.close()
+
+
+class QueryService:
+    '''
+    Headless service answering route queries over HTTP with JSON bodies. The queries are solved by `workers`
+    processes holding the network, at most `max_concurrency` at once, and at most `max_queue` more wait
+    for their turn. Every query has a deadline (in seconds), after which it is answered with an error,
+    the anytime algorithms get the time left as their budget, so they usually answer with the best path found in time.
+    A worker still busy `GRACE` seconds after the deadline is killed and replaced, the other queries go on undisturbed.
+
+        POST /query   {"algorithm": "ants" | "bees" | "exact", "origin": "JFK", "destination": "LAX",
+                       "from": "2015-05-01", "to": "2015-05-10", "deadline": 10, "options": {...}}
+        GET  /health
+    '''
+
+    def __init__(
+        self,
+        network: Network,
+        network_path: Optional[str] = None,
+        workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        max_queue: int = 64,
+        deadline: float = 30
+    ) -> None:
+        self._network = network
+        self._airports = {airport.codename for airport in network.airports}
+
+        self._workers = workers or os.cpu_count() or 1
+        self._max_concurrency = max_concurrency or self._workers
+        self._max_queue = max_queue
+        self._deadline = deadline
+
+        # with a path the workers open the network themselves instead of receiving a copy of it
+        self._worker_network = network_path if network_path is not None else network
+
+        # workers are started by serve, every one of them has a thread waiting for its answers
+        self._pool: List[_Worker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._threads = ThreadPoolExecutor(self._workers)
+
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._running = 0
+
+    def _start_worker(self) -> None:
+        worker = _Worker(self._worker_network)
+        self._pool.append(worker)
+        self._idle.put_nowait(worker)
+
+    def parse(self, body: bytes) -> dict:
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'body is not a valid json')
+
+        if not isinstance(payload, dict):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'body must be a json object')
+
+        algorithm = payload.get('algorithm', 'exact')
+        if algorithm not in ALGORITHMS:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, f'algorithm must be one of: {", ".join(ALGORITHMS)}')
+
+        for name in ('origin', 'destination'):
+            if not isinstance(payload.get(name), str) or payload[name] not in self._airports:
+                raise ServiceError(HTTPStatus.BAD_REQUEST, f'unknown {name} airport: {payload.get(name)}')
+
+        if payload['origin'] == payload['destination']:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'origin and destination airports must be different')
+
+        try:
+            from_date = datetime.fromisoformat(payload.get('from', self._network.start_date.isoformat()))
+            to_date = datetime.fromisoformat(payload.get('to', self._network.end_date.isoformat()))
+            deadline = float(payload.get('deadline', self._deadline))
+        except (TypeError, ValueError) as error:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, str(error))
+
+        # the flights are stored in local times, without a timezone
+        if from_date.tzinfo is not None or to_date.tzinfo is not None:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'dates cannot have a timezone')
+
+        if from_date >= to_date:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'end date must be later than the start date')
+
+        if not math.isfinite(deadline) or deadline <= 0:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'deadline must be a positive number of seconds')
+
+        options = payload.get('options', {})
+        if not isinstance(options, dict):
+            raise ServiceError(HTTPStatus.BAD_REQUEST, 'options must be a json object')
+
+        try:
+            check_options(algorithm, options)
+        except ValueError as error:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, str(error))
+
+        return {
+            'algorithm': algorithm,
+            'origin': payload['origin'],
+            'destination': payload['destination'],
+            'from': from_date,
+            'to': to_date,
+            'deadline': deadline,
+            'options': options
+        }
+
+    async def query(self, query: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + query['deadline']
+
+        if self._waiting >= self._max_queue:
+            raise ServiceError(HTTPStatus.SERVICE_UNAVAILABLE, 'too many queries waiting, try again later')
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=max(deadline - loop.time(), 0))
+            try:
+                worker = await asyncio.wait_for(self._idle.get(), timeout=max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                self._slots.release()
+                raise
+        except asyncio.TimeoutError:
+            raise ServiceError(HTTPStatus.GATEWAY_TIMEOUT, 'deadline passed while the query was waiting')
+        finally:
+            self._waiting -= 1
+
+        # the worker and the slot are freed once the worker is done, even if nobody waits for the answer anymore
+        self._running += 1
+        worker_deadline = time.time() + (deadline - loop.time()) * BUDGET_SHARE
+        future = loop.run_in_executor(self._threads, worker.solve, query, worker_deadline)
+        future.add_done_callback(lambda future: self._release(worker, future))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=max(deadline - loop.time(), 0))
+        except (asyncio.TimeoutError, TimeoutError):
+            loop.call_later(GRACE, self._reap, worker, future)
+            raise ServiceError(HTTPStatus.GATEWAY_TIMEOUT, 'deadline passed while the query was solved')
+        except ValueError as error:
+            raise ServiceError(HTTPStatus.BAD_REQUEST, str(error))
+
+    def _release(self, worker: _Worker, future: asyncio.Future) -> None:
+        future.exception()  # the answer may not be awaited anymore
+
+        if worker.dead:
+            self._pool.remove(worker)
+            worker.close()
+            self._start_worker()
+        else:
+            self._idle.put_nowait(worker)
+
+        self._running -= 1
+        self._slots.release()
+
+    def _reap(self, worker: _Worker, future: asyncio.Future) -> None:
+        # the worker would hold its slot forever, it is killed and replaced once its answer fails
+        if not future.done():
+            worker.kill()
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> dict:
+        if path == '/health' and method == 'GET':
+            return {'status': 'ok', 'running': self._running, 'waiting': self._waiting}
+
+        if path == '/query':
+            if method != 'POST':
+                raise ServiceError(HTTPStatus.METHOD_NOT_ALLOWED, 'queries must be posted')
+            return await self.query(self.parse(body))
+
+        raise ServiceError(HTTPStatus.NOT_FOUND, f'no such endpoint: {path}')
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, target, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, value = line.decode('latin-1').split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length < 0:
+                    raise ValueError('negative content length')
+                if length > MAX_BODY:
+                    raise ServiceError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f'body cannot be longer than {MAX_BODY} bytes')
+
+                body = await reader.readexactly(length)
+            except (ValueError, asyncio.IncompleteReadError):
+                raise ServiceError(HTTPStatus.BAD_REQUEST, 'malformed http request')
+
+            status, payload = HTTPStatus.OK, await self.dispatch(method, target.split('?', 1)[0], body)
+
+        except ServiceError as error:
+            status, payload = error.status, {'error': str(error)}
+        except Exception as error:
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': repr(error)}
+
+        body = json.dumps(payload).encode()
+        writer.write(
+            f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            f'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: close\r\n\r\n'.encode('latin-1') + body
+        )
+
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8000) -> None:
+        self._slots = asyncio.Semaphore(self._max_concurrency)
+        self._idle = asyncio.Queue()
+        for _ in range(self._workers):
+            self._start_worker()
+
+        server = await asyncio.start_server(self.handle, host, port)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        for worker in self._pool:
+            worker.close()
+        self._pool = []
+        self._threads.shutdown(wait=False)
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import json
+
+import numpy as np
+
+from .data import Network, Airline, Airport, FlightTable
+
+
+# on-disk network format: a directory with one .npy file per flights column
+# and a json file describing the network, its airports and airlines
+FORMAT_VERSION = 1
+METADATA_FILE = 'network.json'
+COLUMNS = ['origin', 'destination', 'airline', 'departure', 'arrival', 'price', 'miles']
+
+
+def write_network(network: Network, directory: str) -> None:
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    table = network.table
+    ids = network.flight_ids
+
+    for column in COLUMNS:
+        np.save(directory / f'{column}.npy', getattr(table, column)[ids])
+
+    metadata = {
+        'version': FORMAT_VERSION,
+        'start_date': network.start_date.isoformat(),
+        'end_date': network.end_date.isoformat(),
+        'flights': len(ids),
+        'airlines': [
+            {'codename': airline.codename, 'name': airline.name}
+            for airline in table.airlines
+        ],
+        'airports': [
+            {
+                'codename': airport.codename,
+                'name': airport.name,
+                'city': airport.city,
+                'state': airport.state,
+                'country': airport.country,
+                'longitude': airport.longitude,
+                'latitude': airport.latitude,
+                'terminals': None if airport.terminals is None else int(airport.terminals),
+                'transfer_time': airport.transfer_time // timedelta(minutes=1)
+            }
+            for airport in table.airports
+        ]
+    }
+
+    with open(directory / METADATA_FILE, 'w') as f:
+        json.dump(metadata, f)
+
+
+def read_network(directory: str, mmap: bool = True) -> Network:
+    '''
+    Reads a network written by write_network. With `mmap` the flights columns are memory-mapped,
+    so opening is almost instant and the pages are shared between the processes reading the same files.
+    '''
+    directory = Path(directory)
+
+    if not (directory / METADATA_FILE).exists():
+        raise ValueError(f'the given path does not contain a network ({METADATA_FILE} is missing)')
+
+    with open(directory / METADATA_FILE) as f:
+        metadata = json.load(f)
+
+    if metadata.get('version') != FORMAT_VERSION:
+        raise ValueError(f'unsupported network format version {metadata.get("version")}, expected {FORMAT_VERSION}')
+
+    airlines = [Airline(airline['codename'], airline['name']) for airline in metadata['airlines']]
+    airports = [
+        Airport(
+            airport['codename'],
+            airport['name'],
+            airport['city'],
+            airport['state'],
+            airport['country'],
+            airport['longitude'],
+            airport['latitude'],
+            terminals=airport['terminals'],
+            default_transfer_time=timedelta(minutes=airport['transfer_time'])
+        )
+        for airport in metadata['airports']
+    ]
+
+    columns = {
+        column: np.load(directory / f'{column}.npy', mmap_mode='r' if mmap else None)
+        for column in COLUMNS
+    }
+
+    return Network(
+        datetime.fromisoformat(metadata['start_date']),
+        datetime.fromisoformat(metadata['end_date']),
+        FlightTable(airlines, airports, presorted=True, **columns)
+    )
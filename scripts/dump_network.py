@@ -4,15 +4,20 @@ from datetime import datetime
 import pickle
 
 from flights import Reader
+from flights.storage import write_network
 
 
 if __name__ == '__main__':
     parser = ArgumentParser()
     parser.add_argument('data_dir', help='path to the directory containing flights, airlines and airports csv files')
-    parser.add_argument('output', help='path for the network pickled output file')
+    parser.add_argument('output', help='path for the network pickled output file, or the output directory for the binary format')
+    parser.add_argument('--format', choices=['pickle', 'binary'], default='pickle', help='pickled Network object or memory-mappable binary directory')
     args = parser.parse_args()
 
     network = Reader.read_flights(args.data_dir, datetime(2015, 5, 1), datetime(2015, 6, 30))
 
-    with open(args.output, 'wb') as f:
-        pickle.dump(network, f)
+    if args.format == 'binary':
+        write_network(network, args.output)
+    else:
+        with open(args.output, 'wb') as f:
+            pickle.dump(network, f)
@@ -0,0 +1,27 @@
+from argparse import ArgumentParser
+import asyncio
+
+from flights.service import QueryService, load_network
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('network', help='path to the pickled Network object or to the binary network directory')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes, all the cores by default')
+    parser.add_argument('--max-concurrency', type=int, default=None, help='queries solved at once, the number of workers by default')
+    parser.add_argument('--max-queue', type=int, default=64, help='queries waiting for a worker, the next ones are rejected')
+    parser.add_argument('--deadline', type=float, default=30, help='default deadline of a query in seconds')
+    args = parser.parse_args()
+
+    service = QueryService(
+        load_network(args.network),
+        network_path=args.network,
+        workers=args.workers,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        deadline=args.deadline
+    )
+
+    asyncio.run(service.serve(args.host, args.port))
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from flights import Network, FlightTable, Airport, Airline
+from flights.data import to_minutes, from_minutes
+
+
+START = datetime(2015, 1, 1)
+DAYS = 3
+
+
+def random_network(seed: int, airports: int = 7, flights: int = 300, max_terminals: int = 3) -> Network:
+    rng = np.random.default_rng(seed)
+
+    airports_list = [
+        Airport(f'P{i}', f'Airport {i}', 'City', 'ST', 'USA', 0.0, 0.0, terminals=int(rng.integers(1, max_terminals + 1)))
+        for i in range(airports)
+    ]
+    origin = rng.integers(0, airports, flights)
+    destination = (origin + rng.integers(1, airports, flights)) % airports
+    departure = to_minutes(START) + rng.integers(0, DAYS * 24 * 60, flights)
+    arrival = departure + rng.integers(30, 300, flights)
+    price = rng.integers(10, 300, flights).astype(np.float64)  # whole prices, so that sums compare exactly
+
+    table = FlightTable(
+        [Airline('AA', 'American')], airports_list, origin, destination, np.zeros(flights),
+        departure, arrival, price, np.full(flights, 100)
+    )
+    return Network(START, START + timedelta(days=DAYS + 1), table)
+
+
+def random_query(network: Network, rng: np.random.Generator):
+    source, target = rng.choice(len(network.airports), 2, replace=False)
+    depart_after = to_minutes(START) + int(rng.integers(0, 2000))
+    return int(source), int(target), depart_after, int(rng.integers(0, 3)), float(rng.uniform(100, 600))
+
+
+def assert_feasible(network: Network, path, source: int, target: int, depart_after: int, max_transfers: int, max_cost: float):
+    airports = network.airports
+
+    assert 1 <= len(path) <= max_transfers + 1
+    assert path[0].origin == airports[source] and path[-1].destination == airports[target]
+    assert path[0].departure >= from_minutes(depart_after)
+    assert path[-1].arrival <= network.end_date
+    assert sum(flight.price for flight in path) <= max_cost
+
+    for previous, following in zip(path, path[1:]):
+        assert previous.destination == following.origin
+        assert previous.arrival + previous.destination.transfer_time <= following.departure
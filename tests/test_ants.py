@@ -0,0 +1,61 @@
+from datetime import timedelta
+import multiprocessing
+
+import pytest
+
+from flights.ants import AntColonyAlgorithm, AntColonyConfiguration
+from flights.ants.colonies import _colony_worker
+
+from .networks import START, DAYS, random_network
+
+
+def configuration(**options) -> AntColonyConfiguration:
+    return AntColonyConfiguration(**{
+        'iters_numb': 2000,
+        'result_samples': 10,
+        'ants_number': 30,
+        'ants_spawn_iters': 10,
+        'connection_samples': 3,
+        'direct_connection_impact': 0.8,
+        'time_impact_nodes': 0.6,
+        'pheromone_impact': 0.4,
+        'min_time': START,
+        'max_time': START + timedelta(days=DAYS + 1),
+        'min_conn_time': 30,
+        'max_conn_numb': 3,
+        'max_price': 10000,
+        'pheromone_updating_time': 1000,
+        'time_impact_choice': 0.5,
+        **options
+    })
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+@pytest.mark.parametrize('seed', range(10))
+def test_last_report_is_not_worse_than_the_earlier_ones(seed):
+    network = random_network(seed)
+    algorithm = AntColonyAlgorithm(network, configuration(), seed=seed)
+
+    reports = list(algorithm.iterate(network.airports[0], network.airports[3], report_every=200))
+    assert reports[-1].finished and not any(report.finished for report in reports[:-1])
+    assert all(reports[-1].cost <= report.cost for report in reports[:-1])
+
+    if reports[-1].path is not None:
+        assert reports[-1].cost == pytest.approx(algorithm._path_cost([flight.id for flight in reports[-1].path]))
+
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning')
+def test_colony_falls_back_to_its_best_trail(monkeypatch):
+    network = random_network(0)
+    origin, destination = network.table.airport_id(network.airports[0]), network.table.airport_id(network.airports[3])
+
+    # the colony is run in this process, its commands are queued up front
+    monkeypatch.setattr(AntColonyAlgorithm, '_collect_results', lambda *args: [])
+    parent, child = multiprocessing.Pipe()
+    parent.send(('run', (2000, [])))
+    parent.send(('results', 10))
+    _colony_worker(network, configuration(), 0, origin, destination, None, child)
+
+    cost, path = parent.recv()
+    assert path is not None
+    assert parent.recv() == [(float(network.table.price[path].sum()), len(path), path)]
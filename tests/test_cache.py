@@ -0,0 +1,165 @@
+from dataclasses import replace
+from datetime import datetime, timedelta
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from flights.bees import BeeColonyConfiguration
+from flights.cache import LRUCache, canonical_key, query_key
+
+from .networks import START, random_network
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_bound_evicts_the_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert len(cache) == 2
+
+
+def test_bytes_bound_evicts_the_least_recently_used():
+    cache = LRUCache(max_entries=10, max_bytes=10, sizeof=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'xxxx')
+    cache.get('a')
+    assert cache.bytes == 8
+
+    cache.put('c', 'xxxx')
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.bytes == 8
+
+    # replacing an entry counts only its new size
+    cache.put('a', 'x')
+    assert cache.bytes == 5
+
+    cache.pop('c')
+    assert cache.bytes == 1
+
+
+def test_entry_larger_than_the_bound_is_not_stored():
+    cache = LRUCache(max_entries=10, max_bytes=10, sizeof=len)
+    cache.put('a', 'xxxx')
+    cache.put('b', 'x' * 11)
+
+    assert 'b' not in cache
+    assert cache.get('a') == 'xxxx'
+    assert cache.bytes == 4
+
+
+def test_hits_and_misses():
+    cache = LRUCache()
+    assert cache.get('a') is None
+    cache.put('a', 1)
+    assert cache.get('a') == 1 and cache.get('a') == 1
+    assert cache.get('b', 0) == 0
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    cache.clear()
+    assert (len(cache), cache.bytes, cache.hits, cache.misses) == (0, 0, 0, 0)
+
+
+def test_invalid_bounds():
+    with pytest.raises(ValueError):
+        LRUCache(max_entries=0)
+
+    with pytest.raises(ValueError):
+        LRUCache(max_bytes=10)
+
+
+def test_filter_by_date_returns_the_same_window():
+    network = random_network(0)
+    from_date, to_date = START + timedelta(days=1), START + timedelta(days=2)
+
+    window = network.filter_by_date(from_date, to_date)
+    assert network.filter_by_date(from_date, to_date) is window
+    assert network.filter_by_date(from_date, to_date + timedelta(hours=1)) is not window
+
+    # the bounds are clamped to the network, so equal clamped windows are shared too
+    whole = network.filter_by_date(START - timedelta(days=10), START + timedelta(days=100))
+    assert network.filter_by_date(network.start_date, network.end_date) is whole
+
+    assert (network.window_cache.hits, network.window_cache.misses) == (2, 3)
+
+
+def test_entries_expire_after_the_ttl():
+    clock = Clock()
+    cache = LRUCache(ttl=10, clock=clock)
+    cache.put('a', 1)
+
+    clock.now = 9.5
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+
+    # reading does not extend the life of an entry, putting it again does
+    clock.now = 10
+    assert 'a' not in cache and cache.get('a') is None
+    assert cache.get('b') == 2
+
+    cache.put('b', 3)
+    clock.now = 19.5
+    assert cache.get('b') == 3
+    clock.now = 29.5
+    assert cache.get('b') is None
+
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (3, 2)
+
+
+def configuration(**changes) -> BeeColonyConfiguration:
+    return replace(BeeColonyConfiguration(
+        from_datetime=START, to_datetime=START + timedelta(days=3), max_cost=500.0, transfer_time=timedelta(minutes=30),
+        max_transfers=2, time_priority=0.5, iterations=10, scout_bees=10, best_sites=5, elite_sites=2,
+        elite_sites_bees=5, rest_sites_bees=2, max_shrinkages=3
+    ), **changes)
+
+
+def test_canonical_key_is_stable():
+    key = canonical_key(configuration(), datetime(2015, 1, 1), (1, 2.5), {'a': 1, 'b': [None, True]})
+
+    assert key == canonical_key(configuration(), datetime(2015, 1, 1), [1, 2.5], {'b': [None, True], 'a': 1})
+    assert key == canonical_key(configuration(), datetime(2015, 1, 1), (np.int64(1), np.float64(2.5)), {'a': 1, 'b': [None, True]})
+    assert len(key) == 40 and int(key, 16) >= 0
+
+    assert key != canonical_key(configuration(time_priority=0.6), datetime(2015, 1, 1), (1, 2.5), {'a': 1, 'b': [None, True]})
+    assert key != canonical_key(configuration(), datetime(2015, 1, 1, 0, 1), (1, 2.5), {'a': 1, 'b': [None, True]})
+    assert key != canonical_key(configuration(), datetime(2015, 1, 1), (2.5, 1), {'a': 1, 'b': [None, True]})
+
+
+def test_canonical_key_is_the_same_in_other_processes():
+    # unlike hash(), the key does not depend on the hash seed of the process
+    code = 'from flights.cache import canonical_key; print(canonical_key({"b": "x", "a": (1, "y")}, "z"))'
+    env = dict(os.environ, PYTHONHASHSEED='123')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, env=env, capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == canonical_key({'a': (1, 'y'), 'b': 'x'}, 'z')
+
+
+def test_query_key():
+    network = random_network(0)
+    origin, destination = network.airports[0], network.airports[1]
+    key = query_key(network, configuration(), origin, destination)
+
+    # the same flights give the same key, whatever the network object
+    assert key == query_key(random_network(0), configuration(), origin, destination)
+
+    assert key != query_key(random_network(1), configuration(), origin, destination)
+    assert key != query_key(network, configuration(iterations=11), origin, destination)
+    assert key != query_key(network, configuration(), destination, origin)
+    assert key != query_key(network, configuration(), origin, destination, 'pareto')
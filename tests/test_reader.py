@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta
+import csv
+
+import numpy as np
+import pytest
+
+from flights import Reader, Network
+from flights.data import from_minutes
+
+
+AIRPORTS = ['AAA', 'BBB', 'CCC', 'DDD', 'EEE']
+AIRLINES = ['AA', 'DL', 'UA']
+
+FROM_DATE = datetime(2015, 1, 2, 6, 30)
+TO_DATE = datetime(2015, 1, 5, 18)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    # a tiny data set in the format of the kaggle one, with the kinds of rows the reader has to drop
+    rng = np.random.default_rng(0)
+    directory = tmp_path / 'data'
+    directory.mkdir()
+
+    with open(directory / 'airlines.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['IATA_CODE', 'AIRLINE'])
+        writer.writerows([['AA', 'American Airlines'], ['DL', ''], ['UA', 'United Airlines']])
+
+    with open(directory / 'airports.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['IATA_CODE', 'AIRPORT', 'CITY', 'STATE', 'COUNTRY', 'LATITUDE', 'LONGITUDE'])
+        for i, code in enumerate(AIRPORTS):
+            writer.writerow([code, f'{code} Airport', f'{code} City', 'ST', 'USA', 30 + i, -100 - i])
+
+    with open(directory / 'flights.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            'YEAR', 'MONTH', 'DAY', 'DAY_OF_WEEK', 'AIRLINE', 'FLIGHT_NUMBER', 'ORIGIN_AIRPORT', 'DESTINATION_AIRPORT',
+            'SCHEDULED_DEPARTURE', 'SCHEDULED_TIME', 'DISTANCE', 'SCHEDULED_ARRIVAL'
+        ])
+
+        for day in range(1, 8):
+            for number in range(40):
+                origin, destination = rng.choice(AIRPORTS, 2, replace=False)
+                airline = rng.choice(AIRLINES + ['XX'], p=[0.3, 0.3, 0.3, 0.1])
+                if rng.random() < 0.05:
+                    origin = '10397'  # numeric codes used by some of the months
+
+                hours, minutes, duration = rng.integers(0, 24), rng.integers(0, 60), rng.integers(40, 400)
+                scheduled_time = '' if rng.random() < 0.05 else duration
+                arrival = (hours * 60 + minutes + duration) % (24 * 60)
+
+                writer.writerow([
+                    2015, 1, day, day % 7 + 1, airline, number, origin, destination,
+                    f'{hours * 100 + minutes:04d}', scheduled_time, rng.integers(100, 2500), f'{arrival // 60 * 100 + arrival % 60:04d}'
+                ])
+
+    return directory
+
+
+def reference_flights(data_dir, from_date, to_date) -> list:
+    # row by row reading of the csv files, as the reader did before it was vectorized
+    with open(data_dir / 'airlines.csv') as f:
+        airlines = {row['IATA_CODE'] for row in csv.DictReader(f)}
+    with open(data_dir / 'airports.csv') as f:
+        airports = {row['IATA_CODE'] for row in csv.DictReader(f)}
+
+    flights = []
+    with open(data_dir / 'flights.csv') as f:
+        for row in csv.DictReader(f):
+            if row['SCHEDULED_TIME'] == '' or row['AIRLINE'] not in airlines:
+                continue
+            if row['ORIGIN_AIRPORT'] not in airports or row['DESTINATION_AIRPORT'] not in airports:
+                continue
+
+            scheduled_departure = int(row['SCHEDULED_DEPARTURE'])
+            departure = datetime(
+                int(row['YEAR']), int(row['MONTH']), int(row['DAY']), scheduled_departure // 100, scheduled_departure % 100
+            )
+            arrival = departure + timedelta(minutes=float(row['SCHEDULED_TIME']))
+
+            if departure >= from_date and arrival <= to_date:
+                flights.append((
+                    row['ORIGIN_AIRPORT'], row['DESTINATION_AIRPORT'], row['AIRLINE'], departure, arrival, int(row['DISTANCE'])
+                ))
+
+    # the table keeps the rows ordered by departure, the ties in the file order
+    return sorted(flights, key=lambda flight: flight[3])
+
+
+def table_flights(network: Network) -> list:
+    table = network.table
+    return [
+        (
+            table.airports[origin].codename, table.airports[destination].codename, table.airlines[airline].codename,
+            from_minutes(departure), from_minutes(arrival), miles
+        )
+        for origin, destination, airline, departure, arrival, miles in zip(
+            table.origin.tolist(), table.destination.tolist(), table.airline.tolist(),
+            table.departure.tolist(), table.arrival.tolist(), table.miles.tolist()
+        )
+    ]
+
+
+def assert_same_network(network: Network, other: Network):
+    assert network.start_date == other.start_date and network.end_date == other.end_date
+
+    for column in ('origin', 'destination', 'airline', 'departure', 'arrival', 'price', 'miles'):
+        assert np.array_equal(getattr(network.table, column), getattr(other.table, column)), column
+
+    assert [airport.transfer_time for airport in network.airports] == [airport.transfer_time for airport in other.airports]
+
+
+@pytest.mark.parametrize('chunksize', [None, 7, 100, Reader.CHUNKSIZE])
+def test_read_flights_matches_reference(data_dir, chunksize):
+    network = Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, chunksize=chunksize, seed=1)
+
+    expected = reference_flights(data_dir, FROM_DATE, TO_DATE)
+    assert len(expected) > 0
+    assert table_flights(network) == expected
+
+
+def test_read_flights_chunks_give_the_same_network(data_dir):
+    network = Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, chunksize=None, seed=1)
+
+    for chunksize in (1, 7, 100):
+        assert_same_network(network, Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, chunksize=chunksize, seed=1))
+
+
+def test_read_flights_default_dates(data_dir):
+    network = Reader.read_flights(str(data_dir), seed=1)
+    assert table_flights(network) == reference_flights(data_dir, datetime(2015, 1, 1), datetime(2015, 12, 31))
+
+
+def test_read_flights_missing_files(tmp_path):
+    with pytest.raises(ValueError):
+        Reader.read_flights(str(tmp_path / 'nothing'))
+
+    with pytest.raises(ValueError):
+        Reader.read_flights(str(tmp_path))
+
+
+def test_cached_read_gives_the_same_network(data_dir, tmp_path, monkeypatch):
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+
+    network = Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, seed=1)
+    assert_same_network(network, Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, seed=1, cache_dir=str(cache_dir)))
+    assert len(list(cache_dir.iterdir())) == 1
+
+    # the second read is served by the cache, without parsing the csv files
+    def fail(*args, **kwargs):
+        raise AssertionError('flights.csv parsed despite the cache')
+
+    monkeypatch.setattr(Reader, '_read_flights_csv', fail)
+    assert_same_network(network, Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, seed=1, cache_dir=str(cache_dir)))
+
+
+def test_cache_is_keyed_by_dates_seed_and_files(data_dir, tmp_path):
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+
+    Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, seed=1, cache_dir=str(cache_dir))
+    Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, seed=2, cache_dir=str(cache_dir))
+    Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE + timedelta(days=1), seed=1, cache_dir=str(cache_dir))
+    assert len(list(cache_dir.iterdir())) == 3
+
+    # a changed flights file is read again
+    with open(data_dir / 'flights.csv', 'a', newline='') as f:
+        csv.writer(f).writerow([2015, 1, 3, 6, 'AA', 999, 'AAA', 'EEE', '1234', 61, 4321, '1335'])
+
+    network = Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, seed=1, cache_dir=str(cache_dir))
+    assert len(list(cache_dir.iterdir())) == 4
+    assert table_flights(network) == reference_flights(data_dir, FROM_DATE, TO_DATE)
+    assert ('AAA', 'EEE', 'AA', datetime(2015, 1, 3, 12, 34), datetime(2015, 1, 3, 13, 35), 4321) in table_flights(network)
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_parallel_read_gives_the_same_network(data_dir, workers):
+    network = Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, seed=1)
+    assert_same_network(network, Reader.read_flights(str(data_dir), FROM_DATE, TO_DATE, seed=1, workers=workers))
+
+
+@pytest.mark.parametrize('parts', [1, 2, 7, 1000])
+def test_byte_ranges_split_on_lines(data_dir, parts):
+    path = data_dir / 'flights.csv'
+    content = path.read_bytes()
+
+    header, ranges = Reader._byte_ranges(path, parts)
+    assert content.startswith(header)
+    assert b''.join(content[start:end] for start, end in ranges) == content[len(header):]
+    assert all(content[start - 1:start] == b'\n' for start, _ in ranges)
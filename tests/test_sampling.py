@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from flights.data import from_minutes
+
+from .networks import START, random_network, assert_feasible
+
+
+@pytest.mark.parametrize('sampler', ['random_dfs_search', 'random_bidirectional_search'])
+@pytest.mark.parametrize('seed', range(40))
+def test_sampled_paths_are_feasible(sampler, seed):
+    # dense flights, transfers of up to three hours and windows of a few hours, so that tight connections are common
+    network = random_network(seed, airports=8, flights=900, max_terminals=12)
+    rng = np.random.default_rng(seed)
+
+    for _ in range(10):
+        start = START + timedelta(minutes=int(rng.integers(0, 2 * 24 * 60)))
+        window = network.filter_by_date(start, start + timedelta(hours=int(rng.integers(6, 16))))
+
+        source, target = (int(airport) for airport in rng.choice(len(window.airports), 2, replace=False))
+        depart_after = window.start_minute + int(rng.integers(-60, 120))
+        max_transfers, max_cost = int(rng.integers(0, 4)), float(rng.uniform(100, 900))
+
+        path = getattr(window, sampler)(
+            window.airports[source], window.airports[target], from_minutes(depart_after), max_transfers + 1, max_cost, rng=rng
+        )
+        if path is None:
+            continue
+
+        # the transfers are checked at every airport of the path, the one where the two trees met included
+        assert_feasible(window, path, source, target, depart_after, max_transfers, max_cost)
+        assert path[0].departure >= window.start_date
@@ -0,0 +1,145 @@
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+import pytest
+
+from flights import Network
+from flights.data import to_minutes, from_minutes
+
+from .networks import START, random_network, random_query, assert_feasible
+
+
+def enumerate_paths(network: Network, source: int, target: int, depart_after: int, arrive_before: int,
+                    max_legs: int, max_cost: float) -> list:
+    # all the paths of the window as lists of flight ids, by plain depth-first search over the columns,
+    # independent of the indexes of the table
+    table, transfer = network.table, network.transfer_minutes
+    origin, destination = table.origin.tolist(), table.destination.tolist()
+    departure, arrival, price = table.departure.tolist(), table.arrival.tolist(), table.price.tolist()
+
+    outgoing = defaultdict(list)
+    for i in range(len(table)):
+        if departure[i] >= network.start_minute and arrival[i] <= min(network.end_minute, arrive_before):
+            outgoing[origin[i]].append(i)
+
+    paths = []
+
+    def extend(airport, ready, path, cost):
+        for i in outgoing[airport]:
+            if departure[i] < ready or cost + price[i] > max_cost or destination[i] == source:
+                continue
+
+            if destination[i] == target:
+                paths.append(path + [i])
+            elif len(path) + 1 < max_legs:
+                extend(destination[i], arrival[i] + transfer[destination[i]], path + [i], cost + price[i])
+
+    extend(source, depart_after, [], 0.0)
+    return paths
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_earliest_arrival_matches_brute_force(seed):
+    network = random_network(seed)
+    table, rng = network.table, np.random.default_rng(seed)
+
+    for _ in range(4):
+        source, target, depart_after, max_transfers, max_cost = random_query(network, rng)
+        airports = network.airports
+
+        path = network.earliest_arrival(airports[source], airports[target], from_minutes(depart_after), max_transfers, max_cost)
+        paths = enumerate_paths(network, source, target, depart_after, network.end_minute, max_transfers + 1, max_cost)
+
+        if not paths:
+            assert path is None
+            continue
+
+        expected = min((table.arrival[ids[-1]], table.price[ids].sum()) for ids in paths)
+        assert path is not None
+        assert (to_minutes(path[-1].arrival), sum(flight.price for flight in path)) == expected
+        assert_feasible(network, path, source, target, depart_after, max_transfers, max_cost)
+
+
+@pytest.mark.parametrize('seed', range(8))
+def test_earliest_arrival_in_window(seed):
+    network = random_network(seed).filter_by_date(START + timedelta(days=1), START + timedelta(days=2, hours=12))
+    table, rng = network.table, np.random.default_rng(seed)
+
+    for _ in range(4):
+        source, target, depart_after, max_transfers, max_cost = random_query(network, rng)
+        airports = network.airports
+
+        path = network.earliest_arrival(airports[source], airports[target], from_minutes(depart_after), max_transfers, max_cost)
+        paths = enumerate_paths(
+            network, source, target, max(depart_after, network.start_minute), network.end_minute, max_transfers + 1, max_cost
+        )
+
+        if not paths:
+            assert path is None
+            continue
+
+        assert to_minutes(path[-1].arrival) == min(table.arrival[ids[-1]] for ids in paths)
+        assert path[0].departure >= network.start_date
+
+
+def test_earliest_arrival_to_the_same_airport():
+    network = random_network(0)
+    airport = network.airports[0]
+
+    assert network.earliest_arrival(airport, airport) == []
+
+
+def pareto_criteria(network: Network, paths: list) -> set:
+    # non-dominated (duration, price, flights) triples of the paths
+    table = network.table
+    criteria = {
+        (int(table.arrival[ids[-1]] - table.departure[ids[0]]), float(table.price[ids].sum()), len(ids))
+        for ids in paths
+    }
+    return {x for x in criteria if not any(y != x and all(a <= b for a, b in zip(y, x)) for y in criteria)}
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_pareto_front_matches_brute_force(seed):
+    network = random_network(seed + 100, flights=250)
+    table, rng = network.table, np.random.default_rng(seed)
+
+    for _ in range(3):
+        source, target, from_minute, max_transfers, max_cost = random_query(network, rng)
+        to_minute = from_minute + int(rng.integers(600, 2500))
+        airports = network.airports
+
+        front = network.pareto_front(
+            airports[source], airports[target], from_minutes(from_minute), from_minutes(to_minute), max_transfers, max_cost
+        )
+        paths = enumerate_paths(network, source, target, from_minute, to_minute, max_transfers + 1, max_cost)
+
+        got = {
+            ((path[-1].arrival - path[0].departure) // timedelta(minutes=1), sum(flight.price for flight in path), len(path))
+            for path in front
+        }
+        assert got == pareto_criteria(network, paths)
+
+        for path in front:
+            assert_feasible(network, path, source, target, from_minute, max_transfers, max_cost)
+            assert path[-1].arrival <= from_minutes(to_minute)
+
+        # the scalarized best path of the front is the best of all the paths
+        for time_priority in (0.0, 0.5, 1.0):
+            best = front.best(time_priority)
+            if not paths:
+                assert best is None
+                continue
+
+            value = lambda price, duration: price * (1 - time_priority) + duration * time_priority
+            expected = min(value(table.price[ids].sum(), table.arrival[ids[-1]] - table.departure[ids[0]]) for ids in paths)
+            duration = (best[-1].arrival - best[0].departure) // timedelta(minutes=1)
+            assert value(sum(flight.price for flight in best), duration) == pytest.approx(expected)
+
+
+def test_pareto_front_to_the_same_airport():
+    network = random_network(0)
+    airport = network.airports[0]
+
+    assert len(network.pareto_front(airport, airport, network.start_date, network.end_date)) == 0
@@ -0,0 +1,71 @@
+import json
+import time
+
+import pytest
+
+from flights.service import QueryService, ServiceError, solve
+
+from .networks import random_network
+
+
+@pytest.fixture
+def service():
+    service = QueryService(random_network(0), workers=1)
+    yield service
+    service.close()
+
+
+def body(**payload) -> bytes:
+    return json.dumps({'origin': 'P0', 'destination': 'P3', 'from': '2015-01-01', 'to': '2015-01-04', **payload}).encode()
+
+
+@pytest.mark.parametrize('payload', [
+    {'algorithm': 'ants', 'options': {'iters_numb': 'x'}},
+    {'algorithm': 'ants', 'options': {'iters_numb': 1.5}},
+    {'algorithm': 'ants', 'options': {'iters_numb': -1}},
+    {'algorithm': 'ants', 'options': {'batched': 1}},
+    {'algorithm': 'ants', 'options': {'min_time': '2015-01-01'}},
+    {'algorithm': 'bees', 'options': {'transfer_time': 'x'}},
+    {'algorithm': 'bees', 'options': {'time_priority': float('inf')}},
+    {'algorithm': 'bees', 'options': {'workers': 4}},
+    {'algorithm': 'bees', 'options': {'seed': 1}},
+    {'algorithm': 'exact', 'options': {'time_priority': 'x'}},
+    {'algorithm': 'exact', 'options': {'max_transfers': True}},
+    {'algorithm': 'exact', 'options': {'iters_numb': 10}},
+    {'algorithm': 'exact', 'options': []},
+    {'algorithm': 'genetic'},
+    {'origin': ['P0']},
+    {'origin': 'XXX'},
+    {'destination': 'P0'},
+    {'from': '2015-01-01T00:00+00:00'},
+    {'to': 20150104},
+    {'from': '2015-01-05'},
+    {'deadline': 'nan'},
+    {'deadline': 'inf'},
+    {'deadline': 0},
+    {'deadline': -5},
+])
+def test_parse_rejects_invalid_queries(service, payload):
+    with pytest.raises(ServiceError) as error:
+        service.parse(body(**payload))
+
+    assert error.value.status == 400
+
+
+@pytest.mark.parametrize('payload', [
+    {'algorithm': 'ants', 'options': {'iters_numb': 10, 'batched': True, 'max_price': 500}},
+    {'algorithm': 'bees', 'options': {'transfer_time': 45, 'time_priority': 1}},
+    {'algorithm': 'exact', 'options': {'max_transfers': 2, 'max_cost': 400, 'time_priority': 0.2}},
+    {'deadline': 0.5},
+])
+def test_parse_accepts_valid_queries(service, payload):
+    query = service.parse(body(**payload))
+    assert query['options'] == payload.get('options', {})
+
+
+def test_solve_exact(service):
+    query = service.parse(body(algorithm='exact', options={'max_transfers': 2}))
+    answer = solve(service._network, query, time.time() + 10)
+
+    front = service._network.pareto_front(*service._network.airports[0:4:3], query['from'], query['to'], 2)
+    assert answer['price'] == round(sum(flight.price for flight in front.best(0.5)), 2)